@@ -5,31 +5,56 @@ Created on Tue Apr 28 19:49:26 2020
 @author: slothfulwave612
 Python module for making functions to compute velocity.
 
-Modules Used(1):
+Modules Used(2):
 1. numpy -- numerical computing library.
+2. pandas -- Python library for data manipulation and analysis.
 """
 
 import numpy as np
+import pandas as pd
 
 def remove_velocity(df):
     '''
     Function to remove velocity columns(if present) from the dataframe.
+    The dataframe passed in is not changed.
     
     Argument:
     df -- dataframe object, tracking dataframe.
     
     Returns:
-    df -- dataframe object, tracking dataframe.
+    df -- dataframe object, tracking dataframe without the velocity columns.
     '''
     cols_del = ['vx', 'vy', 'speed']
     
     columns = [cols for cols in df.columns if cols.split('_')[-1] in cols_del]
     
-    df.drop(columns=columns, inplace=True)
+    return df.drop(columns=columns)
+
+def moving_average(values, window):
+    '''
+    Function to smooth every column of an array with a moving average
+    along the time axis, i.e. a NaN makes the whole window NaN.
+    
+    Each column is smoothed with np.convolve, which does the whole window
+    in one pass over a column that fits in the cache, so the array should
+    be in Fortran order(columns contiguous) as the dataframe values are.
     
-    return df
+    Argument:
+    values -- array of shape (n_frames, n_columns).
+    window -- int, smoothing window size in number of frames.
+    
+    Returns:
+    smooth -- array of shape (n_frames, n_columns), in the same order as values.
+    '''
+    ma_window = np.ones(window) / window
+    smooth = np.empty_like(values)
+    
+    for col in range(values.shape[1]):
+        smooth[:, col] = np.convolve(values[:, col], ma_window, mode='same')
+    
+    return smooth
 
-def cal_velocity(df, max_speed=12, window=7):
+def cal_velocity(df, max_speed=12, window=7, vectorised=True):
     '''
     Fucntion to calculate velocity for the tracking dataframe.
     
@@ -37,11 +62,14 @@ def cal_velocity(df, max_speed=12, window=7):
     df -- dataframe object, tracking dataframe.
     max_speed -- int, maximum speed a player can achieve(in meters/second).
     window -- int, smoothing window size in number of frames.
+    vectorised -- bool, True for computing all the players at once,
+                  False for computing one player at a time.
     
     Returns:
-    df -- dataframe object, tracking dataframe.
+    df -- dataframe object, a new tracking dataframe with the velocity columns,
+          the dataframe passed in is not changed.
     '''
-    remove_velocity(df)
+    df = remove_velocity(df)
     ## removing velocity columns if present
     
     ## getting the player ids
@@ -50,6 +78,47 @@ def cal_velocity(df, max_speed=12, window=7):
     ## computing the difference in time for each frame
     dt = df['Time [s]'].diff()
     
+    if vectorised:
+        n_players = len(player_ids)
+        
+        ## (n_frames, 2 * n_players) array for x and then y positions, columns contiguous
+        columns = [player + '_X' for player in player_ids] + [player + '_Y' for player in player_ids]
+        positions = np.asfortranarray(df[columns].to_numpy(dtype=np.float64))
+        
+        velocity = np.empty_like(positions)
+        velocity[0] = np.nan
+        
+        ## one player at a time, so the columns stay in the cache
+        for player in range(n_players):
+            vx, vy = velocity[1:, player], velocity[1:, n_players + player]
+            
+            ## calculating velocities
+            np.subtract(positions[1:, player], positions[:-1, player], out=vx)
+            np.subtract(positions[1:, n_players + player], positions[:-1, n_players + player], out=vy)
+            vx /= dt.values[1:]
+            vy /= dt.values[1:]
+            
+            ## removing outliers
+            outliers = (vx * vx + vy * vy) > max_speed**2
+            vx[outliers] = np.nan
+            vy[outliers] = np.nan
+        
+        ## smooting the values
+        smooth = moving_average(velocity, window)
+        
+        ## columns are kept per channel(all vx, all vy, all speed), so nothing is interleaved
+        values = np.empty((len(df), 3 * n_players), order='F')
+        values[:, :2 * n_players] = smooth
+        for player in range(n_players):
+            vx, vy = smooth[:, player], smooth[:, n_players + player]
+            np.sqrt(vx * vx + vy * vy, out=values[:, 2 * n_players + player])
+        
+        ## attaching all the new columns in one go
+        columns = [player + suffix for suffix in ['_vx', '_vy', '_speed'] for player in player_ids]
+        velocity = pd.DataFrame(values, index=df.index, columns=columns, copy=False)
+        
+        return pd.concat([df, velocity], axis=1)
+    
     for player in player_ids:
         ## calculating velocities
         vx = df[player + '_X'].diff() / dt
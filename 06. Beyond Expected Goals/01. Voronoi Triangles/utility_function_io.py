@@ -7,14 +7,22 @@ Created on Sun Apr 19 13:22:33 2020
 This Python file contain function for input output
 operation for event and tracking data.
 
-Modules Used(2):
+Modules Used(6):
 ----------------
 1. pandas -- Python library for data manipulation and analysis.
 2. csv -- Python module for comma seperated file manipulation.
+3. numpy -- numerical computing library.
+4. os -- for interacting with the operating system.
+5. glob -- for finding files matching a pattern.
+6. hashlib -- for making the cache keys.
 """
 
 import pandas as pd
+import numpy as np
 import csv
+import os
+import glob
+import hashlib
 
 def read_event_data(data_dir, game_id):
     '''
@@ -59,34 +67,118 @@ def convert_values(df):
     
     return df
     
-def read_tracking_data(data_dir, game_id, team_name):
+def cache_paths(file_loc, cache_dir=None, tag='', extra=''):
     '''
-    Function to read in the tracking data.
+    Function to get the cache file locations for a tracking data file.
+    The key is made from the absolute path, size and modification time
+    of the csv file, so an edited or replaced file never hits an old entry.
     
     Arguments:
-    data_dir -- str, the directory where the sample games are present.
-    game_id -- int, the sample game id to be analyzed.
-    team_name -- str, home team or away team
+    file_loc -- str, location of the tracking csv file.
+    cache_dir -- str, directory for the cache files,
+                 None for a 'cache' folder next to the csv file.
+    tag -- str, added to the file name, for keeping data derived from the csv file.
+    extra -- str, added to the key, e.g. parameters used for making derived data.
     
     Returns:
-    the event data
+    values_loc -- str, location of the .npy file having the numeric values.
+    columns_loc -- str, location of the .npy file having the column names.
     '''
-    ## setting the path of our file
-    file_name = 'Sample_Game_{}_RawTrackingData_{}_Team.csv'.format(game_id, team_name)
-    file_loc = data_dir + '/Sample_Game_' + str(game_id) + '/' + file_name 
+    ## making the key from path, size and modification time
+    stat = os.stat(file_loc)
+    key = '{}|{}|{}|{}'.format(os.path.abspath(file_loc), stat.st_size, stat.st_mtime_ns, extra)
+    key = hashlib.md5(key.encode()).hexdigest()[:16]
     
-    ## creating a csv file reader
-    csv_file = open(file_loc, 'r') 
-    reader = csv.reader(csv_file)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(file_loc), 'cache')
+    
+    stem = os.path.splitext(os.path.basename(file_loc))[0] + tag
+    values_loc = os.path.join(cache_dir, '{}_{}.npy'.format(stem, key))
+    columns_loc = os.path.join(cache_dir, '{}_{}_columns.npy'.format(stem, key))
+    
+    return values_loc, columns_loc
+
+def write_cache(track_frame, values_loc, columns_loc):
+    '''
+    Function to save a tracking dataframe as binary .npy files.
+    Older entries for the same csv file are deleted.
+    
+    Arguments:
+    track_frame -- dataframe object, tracking data indexed by frame.
+    values_loc -- str, location of the .npy file having the numeric values.
+    columns_loc -- str, location of the .npy file having the column names.
+    '''
+    cache_dir = os.path.dirname(values_loc)
+    os.makedirs(cache_dir, exist_ok=True)
+    
+    ## deleting old entries of the same file, i.e. the ones with another key
+    prefix = values_loc[:-len('.npy')]
+    stem = prefix[:-len('_0123456789abcdef')]
+    for old_file in glob.glob(glob.escape(stem) + '_' + '[0-9a-f]' * 16 + '*'):
+        if not old_file.startswith(prefix):
+            os.remove(old_file)
+    
+    ## frame number is saved as the first column
+    columns = np.array([track_frame.index.name] + list(track_frame.columns))
+    values = np.column_stack([track_frame.index.values, track_frame.values]).astype(np.float64)
+    
+    ## writing to a temporary file first so that a half written
+    ## cache is never read, values file is written last
+    for arr, file_loc in zip([columns, values], [columns_loc, values_loc]):
+        temp_loc = file_loc + '.tmp'
+        with open(temp_loc, 'wb') as temp_file:
+            np.save(temp_file, arr)
+        os.replace(temp_loc, file_loc)
+
+def read_cache(values_loc, columns_loc, mmap_mode=None):
+    '''
+    Function to load a tracking dataframe from the binary .npy files.
+    With mmap_mode the float columns stay backed by the memory mapped file,
+    only the 'Period' column is copied. With mmap_mode='r' the columns are
+    read-only, use 'c'(copy on write) if the values are to be changed in place.
+    
+    Arguments:
+    values_loc -- str, location of the .npy file having the numeric values.
+    columns_loc -- str, location of the .npy file having the column names.
+    mmap_mode -- str, passed to np.load, None to read the whole array in memory,
+                 'r' for read only and 'c' for copy on write.
+    
+    Returns:
+    track_frame -- dataframe object, tracking data indexed by frame.
+    '''
+    columns = np.load(columns_loc).tolist()
+    values = np.load(values_loc, mmap_mode=mmap_mode)
+    
+    index = pd.Index(values[:, 0].astype(np.int64), name=columns[0])
+    track_frame = pd.DataFrame(values[:, 1:], index=index, columns=columns[1:], copy=False)
+    track_frame['Period'] = track_frame['Period'].astype(np.int64)
+    
+    return track_frame
+
+def read_tracking_columns(file_loc, team_name):
+    '''
+    Function to read the three header lines of a tracking data file
+    and make the column names.
     
-    ## 3rd element in the first line will tell whether the 
-    ## team is Home team or Away Team
-    teamname = next(reader)[3]
-    print('Reading content for {} team'.format(teamname))
+    Arguments:
+    file_loc -- str, location of the tracking csv file.
+    team_name -- str, home team or away team
     
-    ## jersey name of each player
-    jerseys = [j_name for j_name in next(reader) if j_name != '']
-    columns = next(reader)
+    Returns:
+    columns -- list, column names for the tracking dataframe.
+    '''
+    ## creating a csv file reader
+    with open(file_loc, 'r') as csv_file:
+        reader = csv.reader(csv_file)
+        
+        ## 3rd element in the first line will tell whether the 
+        ## team is Home team or Away Team
+        teamname = next(reader)[3]
+        print('Reading content for {} team'.format(teamname))
+        
+        ## jersey name of each player
+        jerseys = [j_name for j_name in next(reader) if j_name != '']
+        columns = next(reader)
     
     ## formatting the names in the columns list
     for i, j in enumerate(jerseys):
@@ -97,10 +189,104 @@ def read_tracking_data(data_dir, game_id, team_name):
     columns[-2] = 'ball_X'
     columns[-1] = 'ball_Y'
     
+    return columns
+
+def read_tracking_data(data_dir, game_id, team_name, use_cache=True, cache_dir=None):
+    '''
+    Function to read in the tracking data.
+    
+    The first read of a file parses the csv and saves the values as binary
+    .npy files, later reads of the same file load the binary copy instead.
+    
+    Arguments:
+    data_dir -- str, the directory where the sample games are present.
+    game_id -- int, the sample game id to be analyzed.
+    team_name -- str, home team or away team
+    use_cache -- bool, True for reading from and writing to the cache.
+    cache_dir -- str, directory for the cache files,
+                 None for a 'cache' folder next to the csv file.
+    
+    Returns:
+    the event data
+    '''
+    ## setting the path of our file
+    file_name = 'Sample_Game_{}_RawTrackingData_{}_Team.csv'.format(game_id, team_name)
+    file_loc = data_dir + '/Sample_Game_' + str(game_id) + '/' + file_name 
+    
+    if use_cache:
+        values_loc, columns_loc = cache_paths(file_loc, cache_dir)
+        
+        if os.path.exists(values_loc) and os.path.exists(columns_loc):
+            print('Reading cached content for {} team'.format(team_name))
+            return read_cache(values_loc, columns_loc)
+    
+    columns = read_tracking_columns(file_loc, team_name)
+    
     track_frame = pd.read_csv(file_loc, names=columns, index_col='Frame', skiprows=3)
     
+    if use_cache:
+        write_cache(track_frame, values_loc, columns_loc)
+    
     return track_frame
     
+def read_tracking_window(data_dir, game_id, team_name, start_frame, end_frame, players=None, chunksize=5000):
+    '''
+    Function to read in the tracking data for a range of frames only.
+    
+    The csv file is read in chunks and reading stops as soon as a chunk
+    goes past end_frame, so memory used depends on the length of the clip
+    and not on the length of the match.
+    
+    Arguments:
+    data_dir -- str, the directory where the sample games are present.
+    game_id -- int, the sample game id to be analyzed.
+    team_name -- str, home team or away team
+    start_frame -- int, first frame to be read.
+    end_frame -- int, last frame to be read(included, same as .loc).
+    players -- list, player ids like 'Home_11' to be read, None for all the players.
+    chunksize -- int, number of rows read at a time.
+    
+    Returns:
+    track_frame -- dataframe object, tracking data for the given frames.
+    '''
+    ## setting the path of our file
+    file_name = 'Sample_Game_{}_RawTrackingData_{}_Team.csv'.format(game_id, team_name)
+    file_loc = data_dir + '/Sample_Game_' + str(game_id) + '/' + file_name 
+    
+    columns = read_tracking_columns(file_loc, team_name)
+    
+    ## selecting the columns for the required players
+    if players is None:
+        usecols = columns
+    else:
+        player_cols = [cols for pid in players for cols in (pid + '_X', pid + '_Y')]
+        missing = [cols for cols in player_cols if cols not in columns]
+        assert len(missing) == 0, "Players not found: {}".format(missing)
+        usecols = columns[:3] + player_cols + ['ball_X', 'ball_Y']
+    
+    chunks = []
+    reader = pd.read_csv(file_loc, names=columns, usecols=usecols, skiprows=3, chunksize=chunksize)
+    
+    with reader:
+        for chunk in reader:
+            frames = chunk['Frame'].values
+            
+            ## keeping only the rows inside the window
+            keep = (frames >= start_frame) & (frames <= end_frame)
+            if keep.any():
+                chunks.append(chunk.loc[keep])
+            
+            ## frames are in increasing order, so we can stop here
+            if frames[-1] >= end_frame:
+                break
+    
+    if len(chunks) == 0:
+        track_frame = pd.DataFrame(columns=usecols).set_index('Frame')
+    else:
+        track_frame = pd.concat(chunks).set_index('Frame')
+    
+    return track_frame[[cols for cols in usecols if cols != 'Frame']]
+    
 def rev_direction(tracking_home, tracking_away):
     '''
     Function to reverse the direction of play for the second half
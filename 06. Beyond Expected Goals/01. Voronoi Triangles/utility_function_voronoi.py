@@ -5,21 +5,28 @@ Created on Thu May  7 20:31:08 2020
 @author: slothfulwave612
 
 This Python module will help create voronoi plots
-and a match clip having voronoi triangles.
+and a match clip having voronoi triangles, and compute
+the pitch area controlled by each player in every frame,
+exactly or on a grid, at the current or the
+velocity-projected positions.
 
-Modules Used(6):
+Modules Used(8):
 1. os -- for interacting with the operating system.
-2. numpy -- numerical computing library.
-3. pandas -- for data manipulation and analysis.
-4. matplotlib -- plotting library in Python.
-5. scipy -- a scientific library for Python.
-6. utility_function_viz -- contains function for various vizualization.
+2. time -- for timing the area computation.
+3. numpy -- numerical computing library.
+4. pandas -- for data manipulation and analysis.
+5. matplotlib -- plotting library in Python.
+6. scipy -- a scientific library for Python.
+7. concurrent.futures -- for computing the areas on a process pool.
+8. utility_function_viz -- contains function for various vizualization.
 """
 import os
+import time
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from scipy.spatial import Voronoi, voronoi_plot_2d, Delaunay
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import utility_function_viz as ufv
 
 
@@ -128,7 +135,7 @@ def make_voronoi_movie(home_team, away_team, events, fname, velocity=False):
     os.system('cmd /c "{}"'.format(command))
     
     test = os.listdir()
-
+    
     ## deleting all the jpg files.
     for item in test:
         if item.endswith(".jpg"):
@@ -220,10 +227,443 @@ def make_movie(home_team, away_team, events, fname, team, velocity=False):
     os.system('cmd /c "{}"'.format(command))
     
     test = os.listdir()
-
+    
     ## deleting all the jpg files.
     for item in test:
         if item.endswith(".jpg"):
             os.remove(item)
             
     print('Done!!!')
+    
+def player_positions(home_team, away_team, horizon=0.0):
+    '''
+    Function to get the positions of all the players of both the teams
+    for every frame.
+    
+    Arguments:
+    home_team -- dataframe object, tracking data for home team.
+    away_team -- dataframe object, tracking data for away team.
+    horizon -- float, time(in seconds) the positions are projected forward using
+               the '_vx' and '_vy' columns from cal_velocity, 0 for the current positions.
+    
+    Returns:
+    player_ids -- list, player ids, home players first and then away players.
+    positions -- array of shape (n_frames, n_players, 2), (x, y) of each player.
+    '''
+    ## check if the indices are matched for both the dataframe
+    assert np.all(home_team.index == away_team.index), "Home and away team index must be the same."
+    
+    player_ids, positions = [], []
+    for team in [home_team, away_team]:
+        ids = [cols[:-2] for cols in team.columns if cols[-2:] == '_X' and cols != 'ball_X']
+        columns = [cols for pid in ids for cols in (pid + '_X', pid + '_Y')]
+        
+        team_positions = team[columns].to_numpy(dtype=np.float64).reshape(len(team), -1, 2)
+        
+        if horizon != 0:
+            ## moving the players at their current velocity, NaN velocity is taken as 0
+            columns = [cols for pid in ids for cols in (pid + '_vx', pid + '_vy')]
+            velocities = team[columns].to_numpy(dtype=np.float64).reshape(len(team), -1, 2)
+            team_positions = team_positions + horizon * np.nan_to_num(velocities)
+        
+        player_ids += ids
+        positions.append(team_positions)
+    
+    return player_ids, np.concatenate(positions, axis=1)
+
+def voronoi_cell_areas(points, field_dims=(105, 68)):
+    '''
+    Function to compute the area of the voronoi cell of each player,
+    with the cells clipped to the pitch.
+    
+    The points are mirrored across the four touchlines, so the edges
+    between a point and its mirror images are the pitch boundary and
+    every cell of the real points is closed and inside the pitch.
+    
+    Arguments:
+    points -- array of shape (n_players, 2), (x, y) of each player, NaN if not on the pitch.
+    field_dims -- tuple, length and width of the pitch.
+    
+    Returns:
+    areas -- array of shape (n_players,), area of each cell(in square meters), NaN if not on the pitch.
+    '''
+    length, width = field_dims
+    areas = np.full(len(points), np.nan)
+    
+    ## players on the pitch, positions outside are moved 1mm inside the touchline
+    ## so no point is the same as its own mirror image
+    valid = ~np.isnan(points).any(axis=1)
+    pts = np.clip(points[valid], [-length / 2 + 1e-3, -width / 2 + 1e-3], [length / 2 - 1e-3, width / 2 - 1e-3])
+    
+    if len(pts) == 0:
+        return areas
+    
+    ## players at the same position, e.g. clipped into the same corner, share one cell
+    pts, inverse, counts = np.unique(pts, axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+    n_points = len(pts)
+    
+    if n_points == 1:
+        areas[valid] = length * width / counts[inverse]
+        return areas
+    
+    ## mirror images across each touchline
+    x, y = pts[:, 0], pts[:, 1]
+    mirrors = [np.column_stack([-length - x, y]), np.column_stack([length - x, y]),
+               np.column_stack([x, -width - y]), np.column_stack([x, width - y])]
+    vor = Voronoi(np.concatenate([pts] + mirrors))
+    
+    ## vertices of every cell one after the other
+    regions = [vor.regions[r] for r in vor.point_region[:n_points]]
+    lengths = np.array([len(region) for region in regions])
+    vertices = vor.vertices[np.concatenate(regions)]
+    cell = np.repeat(np.arange(n_points), lengths)
+    
+    ## ordering the vertices of each cell by angle around the cell centre
+    centre = np.column_stack([np.bincount(cell, vertices[:, 0]), np.bincount(cell, vertices[:, 1])]) / lengths[:, np.newaxis]
+    angle = np.arctan2(vertices[:, 1] - centre[cell, 1], vertices[:, 0] - centre[cell, 0])
+    vertices = vertices[np.lexsort((angle, cell))]
+    
+    ## shoelace formula, the next vertex of the last one is the first one
+    next_idx = np.arange(1, len(vertices) + 1)
+    ends = np.cumsum(lengths)
+    next_idx[ends - 1] = ends - lengths
+    cross = vertices[:, 0] * vertices[next_idx, 1] - vertices[next_idx, 0] * vertices[:, 1]
+    
+    cell_areas = np.abs(np.bincount(cell, cross, minlength=n_points)) / 2
+    areas[valid] = cell_areas[inverse] / counts[inverse]
+    
+    return areas
+
+def voronoi_areas_chunk(positions, start, field_dims=(105, 68)):
+    '''
+    Function to compute the voronoi cell areas for a chunk of frames
+    in a worker process.
+    
+    Arguments:
+    positions -- array of shape (n_frames, n_players, 2), (x, y) of each player.
+    start -- int, position of the first frame of this chunk.
+    field_dims -- tuple, length and width of the pitch.
+    
+    Returns:
+    start -- int, position of the first frame of this chunk.
+    areas -- array of shape (n_frames, n_players), float32 area of each cell.
+    '''
+    areas = np.empty(positions.shape[:2], dtype=np.float32)
+    
+    for i, points in enumerate(positions):
+        areas[i] = voronoi_cell_areas(points, field_dims)
+    
+    return start, areas
+
+def voronoi_areas(home_team, away_team, horizon=0.0, out_loc=None, n_workers=None, chunk_size=2000,
+                  field_dims=(105, 68), method='exact', n_grid_cell_x=105):
+    '''
+    Function to compute the pitch area controlled by each player, i.e. the area of
+    their voronoi cell clipped to the pitch, for every frame of the match.
+    Chunks of frames are spread on a process pool.
+    
+    Arguments:
+    home_team -- dataframe object, tracking data for home team.
+    away_team -- dataframe object, tracking data for away team.
+    horizon -- float, time(in seconds) the positions are projected forward, 0 for the current positions.
+    out_loc -- str, location of a .npy file for the areas, None for keeping them in memory.
+    n_workers -- int, number of worker processes, None for the number of cpus.
+    chunk_size -- int, number of frames sent to a worker at a time.
+    field_dims -- tuple, length and width of the pitch.
+    method -- str, 'exact' for the voronoi polygons(one Qhull call per frame),
+              'grid' for counting the cells of the dominance maps(batches of frames).
+    n_grid_cell_x -- int, number of cells in the grid(in x-direction), for the 'grid' method.
+    
+    Returns:
+    player_ids -- list, player ids, home players first and then away players.
+    areas -- array of shape (n_frames, n_players), float32 area of each cell(in square meters),
+             NaN for players not on the pitch, memory mapped when out_loc is given.
+    '''
+    player_ids, positions = player_positions(home_team, away_team, horizon)
+    
+    if method == 'exact':
+        chunk_function, chunk_args = voronoi_areas_chunk, (field_dims,)
+    elif method == 'grid':
+        chunk_function, chunk_args = grid_areas_chunk, (field_dims, n_grid_cell_x)
+    else:
+        assert False, "method must be exact or grid"
+    
+    ## preallocating the output array
+    if out_loc is None:
+        areas = np.empty(positions.shape[:2], dtype=np.float32)
+    else:
+        areas = np.lib.format.open_memmap(out_loc, mode='w+', dtype=np.float32, shape=positions.shape[:2])
+    
+    if n_workers is None:
+        n_workers = os.cpu_count()
+    
+    print('Computing voronoi areas for {} frames on {} workers'.format(len(positions), n_workers))
+    start_time = time.perf_counter()
+    
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(chunk_function, positions[start: start + chunk_size], start, *chunk_args)
+                   for start in range(0, len(positions), chunk_size)]
+        
+        for future in as_completed(futures):
+            start, chunk = future.result()
+            areas[start: start + len(chunk)] = chunk
+    
+    if out_loc is not None:
+        areas.flush()
+    
+    print('Done in {:.2f}s'.format(time.perf_counter() - start_time))
+    
+    return player_ids, areas
+
+def team_areas(player_ids, areas, index=None):
+    '''
+    Function to add up the voronoi cell areas of the players of each team.
+    
+    Arguments:
+    player_ids -- list, player ids, e.g. 'Home_1'.
+    areas -- array of shape (n_frames, n_players), area of each cell.
+    index -- index for the dataframe, e.g. the frame numbers, None for 0, 1, 2...
+    
+    Returns:
+    team_area -- dataframe object, having 'Home' and 'Away' area for each frame.
+    '''
+    team = np.array([pid.split('_')[0] for pid in player_ids])
+    
+    team_area = pd.DataFrame({team_name: np.nansum(areas[:, team == team_name], axis=1)
+                              for team_name in ['Home', 'Away']}, index=index)
+    
+    return team_area
+
+def space_control(home_team, away_team, horizon=1.0, n_workers=None, chunk_size=2000, field_dims=(105, 68),
+                  method='exact', n_grid_cell_x=105):
+    '''
+    Function to compare the static space control, i.e. voronoi cells at the current
+    positions, with the dynamic one, i.e. voronoi cells at the positions projected
+    forward by horizon seconds, for every frame of the match.
+    
+    Arguments:
+    home_team -- dataframe object, tracking data for home team with velocities from cal_velocity.
+    away_team -- dataframe object, tracking data for away team with velocities from cal_velocity.
+    horizon -- float, time(in seconds) the positions are projected forward.
+    n_workers -- int, number of worker processes, None for the number of cpus.
+    chunk_size -- int, number of frames sent to a worker at a time.
+    field_dims -- tuple, length and width of the pitch.
+    method -- str, 'exact' for the voronoi polygons, 'grid' for the batched dominance maps.
+    n_grid_cell_x -- int, number of cells in the grid(in x-direction), for the 'grid' method.
+    
+    Returns:
+    control -- dataframe object, 'Home' and 'Away' area for the current positions and
+               'Home_projected' and 'Away_projected' area for the projected positions.
+    '''
+    player_ids, static_areas = voronoi_areas(home_team, away_team, n_workers=n_workers, chunk_size=chunk_size,
+                                             field_dims=field_dims, method=method, n_grid_cell_x=n_grid_cell_x)
+    _, dynamic_areas = voronoi_areas(home_team, away_team, horizon=horizon, n_workers=n_workers, chunk_size=chunk_size,
+                                     field_dims=field_dims, method=method, n_grid_cell_x=n_grid_cell_x)
+    
+    control = team_areas(player_ids, static_areas, home_team.index)
+    projected = team_areas(player_ids, dynamic_areas, home_team.index)
+    control[['Home_projected', 'Away_projected']] = projected[['Home', 'Away']]
+    
+    return control
+
+def pitch_grid(n_grid_cell_x=105, field_dims=(105, 68)):
+    '''
+    Function to break the pitch down into a grid of equal cells.
+    
+    Arguments:
+    n_grid_cell_x -- int, number of cells in the grid(in x-direction).
+    field_dims -- tuple, length and width of the pitch.
+    
+    Returns:
+    x_grid -- array, x position of the centre of the cells.
+    y_grid -- array, y position of the centre of the cells.
+    '''
+    ## n_grid_cell_y will be calculated based on n_grid_cell_x and field dimensions
+    n_grid_cell_y = int(n_grid_cell_x * field_dims[1] / field_dims[0])
+    
+    dx, dy = field_dims[0] / n_grid_cell_x, field_dims[1] / n_grid_cell_y
+    x_grid = -field_dims[0] / 2 + dx * (np.arange(n_grid_cell_x) + 0.5)
+    y_grid = -field_dims[1] / 2 + dy * (np.arange(n_grid_cell_y) + 0.5)
+    
+    return x_grid, y_grid
+
+def dominance_maps_chunk(positions, start, n_grid_cell_x=105, field_dims=(105, 68), batch_size=4):
+    '''
+    Function to find the nearest player to every grid cell for a chunk
+    of frames in a worker process.
+    
+    The squared distances of a batch of frames are made as one
+    (n_frames, ny, nx, n_players) array from the x and y parts, which the
+    grid keeps apart, and the nearest player is its argmin. Small batches
+    keep the array in the cache.
+    
+    Arguments:
+    positions -- array of shape (n_frames, n_players, 2), (x, y) of each player.
+    start -- int, position of the first frame of this chunk.
+    n_grid_cell_x -- int, number of cells in the grid(in x-direction).
+    field_dims -- tuple, length and width of the pitch.
+    batch_size -- int, number of frames done at a time.
+    
+    Returns:
+    start -- int, position of the first frame of this chunk.
+    owners -- array of shape (n_frames, ny, nx), int8 index of the nearest player, -1 if none.
+    '''
+    x_grid, y_grid = pitch_grid(n_grid_cell_x, field_dims)
+    
+    owners = np.empty((len(positions), len(y_grid), len(x_grid)), dtype=np.int8)
+    
+    for batch in range(0, len(positions), batch_size):
+        points = positions[batch: batch + batch_size]
+        
+        ## players not on the pitch are infinitely far from every cell
+        valid = ~np.isnan(points).any(axis=2)
+        points = np.where(valid[:, :, np.newaxis], points, np.inf)
+        
+        ## squared distance along x and along y, of shape (n_frames, nx or ny, n_players)
+        dx = (x_grid[np.newaxis, :, np.newaxis] - points[:, np.newaxis, :, 0])**2
+        dy = (y_grid[np.newaxis, :, np.newaxis] - points[:, np.newaxis, :, 1])**2
+        
+        ## nearest player to every cell
+        nearest = (dy[:, :, np.newaxis, :] + dx[:, np.newaxis, :, :]).argmin(axis=3).astype(np.int8)
+        nearest[~valid.any(axis=1)] = -1
+        
+        owners[batch: batch + batch_size] = nearest
+    
+    return start, owners
+
+def dominance_maps(home_team, away_team, n_grid_cell_x=105, horizon=0.0, out_loc=None, n_workers=None,
+                   chunk_size=2000, field_dims=(105, 68), batch_size=4):
+    '''
+    Function to make a map of the nearest player to every cell of a fixed pitch grid,
+    i.e. a rasterised voronoi diagram, for every frame of the match.
+    Chunks of frames are spread on a process pool.
+    
+    Arguments:
+    home_team -- dataframe object, tracking data for home team.
+    away_team -- dataframe object, tracking data for away team.
+    n_grid_cell_x -- int, number of cells in the grid(in x-direction).
+    horizon -- float, time(in seconds) the positions are projected forward, 0 for the current positions.
+    out_loc -- str, location of a .npy file for the maps, None for keeping them in memory.
+    n_workers -- int, number of worker processes, None for the number of cpus.
+    chunk_size -- int, number of frames sent to a worker at a time.
+    field_dims -- tuple, length and width of the pitch.
+    batch_size -- int, number of frames a worker does at a time.
+    
+    Returns:
+    player_ids -- list, player ids, home players first and then away players.
+    owners -- array of shape (n_frames, ny, nx), int8 index in player_ids of the nearest player,
+              -1 if no player is on the pitch, memory mapped when out_loc is given.
+    x_grid -- array, x position of the centre of the cells.
+    y_grid -- array, y position of the centre of the cells.
+    '''
+    player_ids, positions = player_positions(home_team, away_team, horizon)
+    x_grid, y_grid = pitch_grid(n_grid_cell_x, field_dims)
+    
+    if len(player_ids) > 127:
+        assert False, "At most 127 players can be stored as int8"
+    
+    ## preallocating the output array
+    shape = (len(positions), len(y_grid), len(x_grid))
+    if out_loc is None:
+        owners = np.empty(shape, dtype=np.int8)
+    else:
+        owners = np.lib.format.open_memmap(out_loc, mode='w+', dtype=np.int8, shape=shape)
+    
+    if n_workers is None:
+        n_workers = os.cpu_count()
+    
+    print('Computing dominance maps for {} frames on {} workers'.format(len(positions), n_workers))
+    start_time = time.perf_counter()
+    
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(dominance_maps_chunk, positions[start: start + chunk_size], start,
+                                   n_grid_cell_x, field_dims, batch_size)
+                   for start in range(0, len(positions), chunk_size)]
+        
+        for future in as_completed(futures):
+            start, chunk = future.result()
+            owners[start: start + len(chunk)] = chunk
+    
+    if out_loc is not None:
+        owners.flush()
+    
+    print('Done in {:.2f}s'.format(time.perf_counter() - start_time))
+    
+    return player_ids, owners, x_grid, y_grid
+
+def dominance_areas(owners, n_players, field_dims=(105, 68), chunk_size=2000):
+    '''
+    Function to compute the pitch area owned by each player in every frame
+    from the dominance maps.
+    
+    Arguments:
+    owners -- array of shape (n_frames, ny, nx), returned by dominance_maps.
+    n_players -- int, number of players, i.e. len(player_ids).
+    field_dims -- tuple, length and width of the pitch.
+    chunk_size -- int, number of frames counted at a time.
+    
+    Returns:
+    areas -- array of shape (n_frames, n_players), float32 area owned by each player(in square meters).
+    '''
+    n_frames, n_grid_cell_y, n_grid_cell_x = owners.shape
+    cell_area = field_dims[0] * field_dims[1] / (n_grid_cell_x * n_grid_cell_y)
+    
+    areas = np.empty((n_frames, n_players), dtype=np.float32)
+    
+    for start in range(0, n_frames, chunk_size):
+        chunk = np.asarray(owners[start: start + chunk_size]).reshape(-1, n_grid_cell_x * n_grid_cell_y)
+        
+        ## one bincount for the whole chunk, each frame has its own n_players + 1 bins
+        ## the last bin of a frame is for cells with no owner
+        bins = np.where(chunk < 0, n_players, chunk) + (n_players + 1) * np.arange(len(chunk))[:, np.newaxis]
+        counts = np.bincount(bins.ravel(), minlength=(n_players + 1) * len(chunk)).reshape(len(chunk), -1)
+        areas[start: start + len(chunk)] = counts[:, :n_players] * cell_area
+    
+    return areas
+
+def dominance_heatmap(owners, player_ids, team_name, chunk_size=2000):
+    '''
+    Function to make a heatmap of how often each cell of the pitch
+    is owned by a team.
+    
+    Arguments:
+    owners -- array of shape (n_frames, ny, nx), returned by dominance_maps.
+    player_ids -- list, player ids, e.g. 'Home_1'.
+    team_name -- str, 'Home' or 'Away'.
+    chunk_size -- int, number of frames counted at a time.
+    
+    Returns:
+    heatmap -- array of shape (ny, nx), share of the frames in which the team owns each cell.
+    '''
+    ## True for the players of the team, last value is for cells with no owner
+    is_team = np.array([pid.split('_')[0] == team_name for pid in player_ids] + [False])
+    
+    counts = np.zeros(owners.shape[1:], dtype=np.int64)
+    for start in range(0, len(owners), chunk_size):
+        counts += is_team[np.asarray(owners[start: start + chunk_size])].sum(axis=0)
+    
+    return counts / max(len(owners), 1)
+
+def grid_areas_chunk(positions, start, field_dims=(105, 68), n_grid_cell_x=105):
+    '''
+    Function to compute the area owned by each player from the dominance maps
+    for a chunk of frames in a worker process, without keeping the maps.
+    
+    Arguments:
+    positions -- array of shape (n_frames, n_players, 2), (x, y) of each player.
+    start -- int, position of the first frame of this chunk.
+    field_dims -- tuple, length and width of the pitch.
+    n_grid_cell_x -- int, number of cells in the grid(in x-direction).
+    
+    Returns:
+    start -- int, position of the first frame of this chunk.
+    areas -- array of shape (n_frames, n_players), float32 area owned by each player,
+             NaN for players not on the pitch.
+    '''
+    _, owners = dominance_maps_chunk(positions, start, n_grid_cell_x, field_dims)
+    
+    areas = dominance_areas(owners, positions.shape[1], field_dims)
+    areas[np.isnan(positions).any(axis=2)] = np.nan
+    
+    return start, areas
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:05:12 2026
+
+@author: slothfulwave612
+
+Benchmark for the pitch control model on synthetic tracking data,
+so no data files are needed. Timings are printed as JSON.
+
+Usage:
+python benchmark_pitch_control.py --out benchmark_results.json
+
+Modules Used(6):
+----------------
+1. argparse -- for the command line arguments.
+2. json -- for writing the results.
+3. time -- for timing the functions.
+4. numpy -- numerical computing library.
+5. pandas -- Python library for data manipulation and analysis.
+6. utility_function_pitch_control -- Python module for pitch control functions.
+"""
+
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+import utility_function_pitch_control as ufpc
+
+def make_synthetic_tracking(n_frames=7500, n_players=11, fps=25, max_speed=7.0, seed=0):
+    '''
+    Function to make deterministic synthetic tracking data for both the teams,
+    in the same form as the tracking data after converting values, reversing
+    direction and computing velocities.
+    
+    Players wander around a 4-4-2 like shape with random accelerations and
+    their speed is kept below max_speed, the ball moves from player to player.
+    
+    Arguments:
+    n_frames -- int, number of frames.
+    n_players -- int, number of players in each team.
+    fps -- int, frames per second.
+    max_speed -- float, maximum player speed(in meters/second).
+    seed -- int, seed for the random number generator.
+    
+    Returns:
+    tracking_home -- dataframe object, tacking data for home team.
+    tracking_away -- dataframe object, tracking data for away team.
+    '''
+    rng = np.random.default_rng(seed)
+    dt = 1 / fps
+    field_dims = (105, 68)
+    
+    ## base shape of a team, home attacks from right -> left
+    base_x = np.array([-45, -30, -30, -30, -30, -10, -10, -10, -10, 10, 10])[:n_players]
+    base_y = np.array([0, -24, -8, 8, 24, -24, -8, 8, 24, -8, 8])[:n_players]
+    base = np.column_stack([base_x, base_y]).astype(np.float64)
+    
+    tracking = []
+    for sign in [-1, 1]:
+        positions = np.empty((n_frames, n_players, 2))
+        velocities = np.empty((n_frames, n_players, 2))
+    
+        pos = sign * base * [-1, 1] + rng.normal(0, 2, (n_players, 2))
+        vel = np.zeros((n_players, 2))
+    
+        for i in range(n_frames):
+            ## random acceleration with a pull back to the base shape
+            acc = rng.normal(0, 3, (n_players, 2)) - 0.05 * (pos - sign * base * [-1, 1]) - 0.5 * vel
+            vel = vel + acc * dt
+    
+            ## keeping the speed below max_speed
+            speed = np.hypot(vel[:, 0], vel[:, 1])[:, np.newaxis]
+            vel = np.where(speed > max_speed, vel * max_speed / np.maximum(speed, 1e-9), vel)
+    
+            pos = np.clip(pos + vel * dt, [-field_dims[0] / 2, -field_dims[1] / 2], [field_dims[0] / 2, field_dims[1] / 2])
+            positions[i], velocities[i] = pos, vel
+    
+        tracking.append((positions, velocities))
+    
+    ## ball goes to a random player every two seconds
+    all_positions = np.concatenate([tracking[0][0], tracking[1][0]], axis=1)
+    owner = np.repeat(rng.integers(0, 2 * n_players, n_frames // (2 * fps) + 1), 2 * fps)[:n_frames]
+    ball = all_positions[np.arange(n_frames), owner] + rng.normal(0, 0.5, (n_frames, 2))
+    
+    ## making the dataframes
+    frames = pd.Index(np.arange(1, n_frames + 1), name='Frame')
+    team_frames = []
+    for team_name, (positions, velocities) in zip(['Home', 'Away'], tracking):
+        data = {'Period': np.where(frames <= n_frames // 2, 1, 2), 'Time [s]': frames.values * dt}
+        for j in range(n_players):
+            pid = '{}_{}'.format(team_name, j + 1)
+            data[pid + '_X'], data[pid + '_Y'] = positions[:, j, 0], positions[:, j, 1]
+            data[pid + '_vx'], data[pid + '_vy'] = velocities[:, j, 0], velocities[:, j, 1]
+            data[pid + '_speed'] = np.hypot(velocities[:, j, 0], velocities[:, j, 1])
+        data['ball_X'], data['ball_Y'] = ball[:, 0], ball[:, 1]
+        team_frames.append(pd.DataFrame(data, index=frames))
+    
+    return team_frames[0], team_frames[1]
+
+def make_synthetic_passes(tracking_home, tracking_away, n_passes=1000, seed=0):
+    '''
+    Function to make deterministic synthetic pass events, each one from the
+    ball position to a team-mate's position one second later.
+    
+    Arguments:
+    tracking_home -- dataframe object, tacking data for home team.
+    tracking_away -- dataframe object, tracking data for away team.
+    n_passes -- int, number of passes.
+    seed -- int, seed for the random number generator.
+    
+    Returns:
+    event_data -- dataframe object, pass events.
+    '''
+    rng = np.random.default_rng(seed)
+    
+    frames = np.sort(rng.integers(tracking_home.index[0], tracking_home.index[-1] - 25, n_passes))
+    teams = rng.choice(['Home', 'Away'], n_passes)
+    ## receivers are outfield players, i.e. not player 1
+    receivers = rng.integers(2, 12, n_passes)
+    
+    rows = []
+    for frame, team, receiver in zip(frames, teams, receivers):
+        tracking = tracking_home if team == 'Home' else tracking_away
+        pid = '{}_{}'.format(team, receiver)
+        rows.append({'Team': team, 'Type': 'PASS', 'Subtype': np.nan, 'Period': tracking.loc[frame, 'Period'],
+                     'Start Frame': frame, 'End Frame': frame + 25,
+                     'Start X': tracking.loc[frame, 'ball_X'], 'Start Y': tracking.loc[frame, 'ball_Y'],
+                     'End X': tracking.loc[frame + 25, pid + '_X'], 'End Y': tracking.loc[frame + 25, pid + '_Y']})
+    
+    return pd.DataFrame(rows)
+
+def time_function(func, repeat=5):
+    '''
+    Function to time a function call.
+    
+    Arguments:
+    func -- function, called with no arguments.
+    repeat -- int, number of times the function is called.
+    
+    Returns:
+    timing -- dict, best and mean time(in milliseconds).
+    '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    
+    return {'best_ms': round(min(times), 4), 'mean_ms': round(float(np.mean(times)), 4), 'repeat': repeat}
+
+def run_benchmark(grid_sizes=(25, 50, 100), n_batch_frames=50, repeat=5, seed=0):
+    '''
+    Function to run all the benchmarks.
+    
+    Arguments:
+    grid_sizes -- tuple, values of n_grid_cell_x for the surface benchmarks.
+    n_batch_frames -- int, number of frames for the batch surface benchmark.
+    repeat -- int, number of times each function is called.
+    seed -- int, seed for the synthetic data.
+    
+    Returns:
+    results -- dict, timings of every benchmark.
+    '''
+    params = ufpc.default_model_params()
+    
+    tracking_home, tracking_away = make_synthetic_tracking(seed=seed)
+    event_data = make_synthetic_passes(tracking_home, tracking_away, seed=seed)
+    
+    event_id = len(event_data) // 2
+    frame = event_data.loc[event_id, 'Start Frame']
+    home_row = tracking_home.loc[frame]
+    
+    results = {'config': {'n_frames': len(tracking_home), 'n_players': 22, 'n_passes': len(event_data),
+                          'grid_sizes': list(grid_sizes), 'n_batch_frames': n_batch_frames, 'seed': seed},
+               'benchmarks': {}}
+    benchmarks = results['benchmarks']
+    
+    ## player initialisation
+    benchmarks['initialize_players'] = time_function(lambda: ufpc.initialize_players(home_row, 'Home', params), repeat)
+    benchmarks['initialize_team'] = time_function(lambda: ufpc.initialize_team(home_row, 'Home', params), repeat)
+    
+    team_state = ufpc.initialize_team(home_row, 'Home', params)
+    
+    for n_grid_cell_x in grid_sizes:
+        ## time to intercept for the whole grid
+        n_grid_cell_y = int(n_grid_cell_x * 68 / 105)
+        x_mesh, y_mesh = np.meshgrid(np.linspace(-52.5, 52.5, n_grid_cell_x), np.linspace(-34, 34, n_grid_cell_y))
+        targets = np.column_stack([x_mesh.ravel(), y_mesh.ravel()])
+        benchmarks['time_to_intercept_{}'.format(n_grid_cell_x)] = time_function(
+            lambda: team_state.time_to_intercept(targets), repeat)
+    
+        ## single surface
+        benchmarks['surface_{}'.format(n_grid_cell_x)] = time_function(
+            lambda: ufpc.generate_pitch_control_for_events(event_id, event_data, tracking_home, tracking_away,
+                                                           params, n_grid_cell_x), repeat)
+        _, _, _, _, mean_steps = ufpc.generate_pitch_control_for_events(event_id, event_data, tracking_home,
+                                                                        tracking_away, params, n_grid_cell_x,
+                                                                        return_steps=True)
+        benchmarks['surface_{}'.format(n_grid_cell_x)]['mean_steps'] = round(float(mean_steps), 2)
+    
+    ## batch surfaces, for consecutive frames
+    frames = tracking_home.loc[frame:].index.values[:n_batch_frames]
+    benchmarks['batch_surfaces_{}x{}'.format(n_batch_frames, grid_sizes[0])] = time_function(
+        lambda: ufpc.pitch_control_for_frames(tracking_home, tracking_away, 'Home', params, frames,
+                                              n_grid_cell_x=grid_sizes[0]), max(1, repeat // 2))
+    
+    ## point queries
+    for n_targets in [1, 100]:
+        targets = np.column_stack([np.linspace(-50, 50, n_targets), np.linspace(-30, 30, n_targets)])
+        benchmarks['point_query_{}'.format(n_targets)] = time_function(
+            lambda: ufpc.pitch_control_at_targets(event_id, event_data, tracking_home, tracking_away, params, targets),
+            repeat)
+    
+    ## every pass at once
+    benchmarks['pass_success_probability_{}'.format(len(event_data))] = time_function(
+        lambda: ufpc.pass_success_probability(event_data, tracking_home, tracking_away, params), repeat)
+    
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the pitch control model on synthetic tracking data.')
+    parser.add_argument('--out', default=None, help='file for the JSON results, printed only if not given')
+    parser.add_argument('--repeat', type=int, default=5, help='number of times each function is called')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the synthetic data')
+    args = parser.parse_args()
+    
+    results = run_benchmark(repeat=args.repeat, seed=args.seed)
+    
+    print(json.dumps(results, indent=2))
+    if args.out is not None:
+        with open(args.out, 'w') as out_file:
+            json.dump(results, out_file, indent=2)
@@ -0,0 +1,471 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:12:40 2026
+
+@author: slothfulwave612
+
+This Python module will contain functions for loading,
+converting and computing velocities for many games at once,
+for computing pitch control for many events at once and
+for fitting the pitch control model parameters.
+
+Worker processes save their results as .npy files next to the
+tracking data cache and only the file locations are sent back,
+so no dataframe is pickled between processes.
+
+Modules Used(9):
+----------------
+1. os -- for interacting with the operating system.
+2. time -- for timing each game.
+3. itertools -- for making the parameter grid.
+4. numpy -- for the pitch control surface arrays.
+5. pandas -- for the calibration results.
+6. concurrent.futures -- for running the games on a process pool.
+7. utility_function_io -- Python module for loading the data sets.
+8. utility_function_velocity -- Python module for velocity functions.
+9. utility_function_pitch_control -- Python module for pitch control functions.
+"""
+
+import os
+import time
+import itertools
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import utility_function_io as ufio
+import utility_function_velocity as ufvel
+import utility_function_pitch_control as ufpc
+
+## tracking data loaded once by each worker process, see load_worker_tracking
+worker_tracking = {}
+
+## pass states sent once to each worker process, see load_worker_states
+worker_states = {}
+
+def process_game(data_dir, game_id, cache_dir=None, max_speed=12, window=7):
+    '''
+    Function to load, convert and compute velocities for one game and
+    save both the tracking dataframes as .npy files.
+    If the files are already there for the same csv files and parameters
+    they are used as they are.
+    
+    Arguments:
+    data_dir -- str, the directory where the sample games are present.
+    game_id -- int, the sample game id to be analyzed.
+    cache_dir -- str, directory for the cache files,
+                 None for a 'cache' folder next to the csv file.
+    max_speed -- int, maximum speed a player can achieve(in meters/second).
+    window -- int, smoothing window size in number of frames.
+    
+    Returns:
+    result -- dict, having 'game_id', 'pid', 'seconds', 'cached' and
+              (values_loc, columns_loc) for 'Home' and 'Away'.
+    '''
+    start = time.perf_counter()
+    
+    result = {'game_id': game_id, 'pid': os.getpid(), 'cached': True}
+    
+    ## getting the file locations for both the teams
+    for team_name in ['Home', 'Away']:
+        file_name = 'Sample_Game_{}_RawTrackingData_{}_Team.csv'.format(game_id, team_name)
+        file_loc = data_dir + '/Sample_Game_' + str(game_id) + '/' + file_name
+    
+        result[team_name] = ufio.cache_paths(file_loc, cache_dir, tag='_processed',
+                                             extra='{}|{}'.format(max_speed, window))
+    
+        if not os.path.exists(result[team_name][0]):
+            result['cached'] = False
+    
+    if not result['cached']:
+        ## loading in the tracking data, converting values and reversing second half
+        match = ufio.read_match_tracking(data_dir, game_id, cache_dir=cache_dir)
+    
+        for team_name in ['Home', 'Away']:
+            ## computing velocity
+            track_frame = ufvel.cal_velocity(match.team_frame(team_name), max_speed=max_speed, window=window)
+            ufio.write_cache(track_frame, *result[team_name])
+    
+    result['seconds'] = time.perf_counter() - start
+    
+    return result
+
+def process_games(data_dir, game_ids, n_workers=None, cache_dir=None, max_speed=12, window=7):
+    '''
+    Function to load, convert and compute velocities for many games
+    at once on a process pool.
+    
+    Arguments:
+    data_dir -- str, the directory where the sample games are present.
+    game_ids -- list, the sample game ids to be analyzed.
+    n_workers -- int, number of worker processes, None for the number of cpus.
+    cache_dir -- str, directory for the cache files,
+                 None for a 'cache' folder next to the csv file.
+    max_speed -- int, maximum speed a player can achieve(in meters/second).
+    window -- int, smoothing window size in number of frames.
+    
+    Returns:
+    results -- list, one dict from process_game for each game, in order of game_ids.
+    '''
+    if n_workers is None:
+        n_workers = os.cpu_count()
+    n_workers = max(1, min(n_workers, len(game_ids)))
+    
+    print('Processing {} games on {} workers'.format(len(game_ids), n_workers))
+    start = time.perf_counter()
+    
+    results = {}
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = {executor.submit(process_game, data_dir, game_id, cache_dir, max_speed, window): game_id
+                   for game_id in game_ids}
+    
+        for future in as_completed(futures):
+            result = future.result()
+            results[result['game_id']] = result
+            print('Game {} done in {:.2f}s{}'.format(result['game_id'], result['seconds'],
+                                                     ' (cached)' if result['cached'] else ''))
+    
+    print('All games done in {:.2f}s'.format(time.perf_counter() - start))
+    
+    return [results[game_id] for game_id in game_ids]
+
+def load_processed_game(result, mmap_mode='c'):
+    '''
+    Function to load the tracking dataframes saved by process_game.
+    The default copy on write mapping shares the file pages until a value
+    is changed, changes are kept in memory and never written to the file.
+    
+    Arguments:
+    result -- dict, returned by process_game or process_games.
+    mmap_mode -- str, passed to np.load, None to read the whole array in memory,
+                 'c' for copy on write and 'r' for read-only dataframes.
+    
+    Returns:
+    tracking_home -- dataframe object, tacking data for home team.
+    tracking_away -- dataframe object, tracking data for away team.
+    '''
+    tracking_home = ufio.read_cache(*result['Home'], mmap_mode=mmap_mode)
+    tracking_away = ufio.read_cache(*result['Away'], mmap_mode=mmap_mode)
+    
+    return tracking_home, tracking_away
+
+def load_worker_tracking(result):
+    '''
+    Function run once in every worker process for loading the tracking
+    dataframes saved by process_game. The .npy files are memory mapped
+    read-only, so all the workers share the same pages and the dataframes
+    must not be changed in place.
+    
+    Arguments:
+    result -- dict, returned by process_game.
+    '''
+    worker_tracking['Home'], worker_tracking['Away'] = load_processed_game(result, mmap_mode='r')
+
+def pitch_control_chunk(event_data, start, params, n_grid_cell_x=50, out_loc=None):
+    '''
+    Function to compute the pitch control surfaces for a chunk of events
+    in a worker process.
+    
+    Arguments:
+    event_data -- event dataframe, having only the events of this chunk.
+    start -- int, position of the first event of this chunk in the output array.
+    params -- dict, default parameters for our model.
+    n_grid_cell_x -- int, number of pixels in the grid(in x-direction).
+    out_loc -- str, location of the output .npy file, None for sending back the surfaces.
+    
+    Returns:
+    start -- int, position of the first event of this chunk in the output array.
+    surfaces -- array of shape (n_events, ny, nx), None if written to out_loc.
+    '''
+    surfaces = []
+    for event_id in event_data.index:
+        PPCF_a, _, _, _ = ufpc.generate_pitch_control_for_events(event_id, event_data, worker_tracking['Home'],
+                                                                 worker_tracking['Away'], params, n_grid_cell_x)
+        surfaces.append(PPCF_a)
+    surfaces = np.array(surfaces, dtype=np.float32)
+    
+    if out_loc is not None:
+        ## writing straight into our rows of the preallocated file
+        out = np.load(out_loc, mmap_mode='r+')
+        out[start: start + len(surfaces)] = surfaces
+        out.flush()
+        del out
+        surfaces = None
+    
+    return start, surfaces
+
+def pitch_control_for_events(data_dir, game_id, event_data, event_ids, params, n_grid_cell_x=50,
+                             n_workers=None, chunk_size=20, out_loc=None, cache_dir=None):
+    '''
+    Function to compute the pitch control surfaces for many events of a game
+    on a process pool, e.g. every pass of the match.
+    
+    The tracking data is loaded and the velocities are computed once by
+    process_game, the workers then memory map the same .npy files.
+    
+    Arguments:
+    data_dir -- str, the directory where the sample games are present.
+    game_id -- int, the sample game id to be analyzed.
+    event_data -- event dataframe, already converted and with the second half reversed.
+    event_ids -- list, index of the events in event's dataframe.
+    params -- dict, default parameters for our model.
+    n_grid_cell_x -- int, number of pixels in the grid(in x-direction).
+    n_workers -- int, number of worker processes, None for the number of cpus.
+    chunk_size -- int, number of events sent to a worker at a time.
+    out_loc -- str, location of a .npy file for the surfaces, None for keeping them in memory.
+    cache_dir -- str, directory for the cache files,
+                 None for a 'cache' folder next to the csv file.
+    
+    Returns:
+    surfaces -- array of shape (len(event_ids), ny, nx), pitch control of the attacking team
+                for each event, memory mapped when out_loc is given.
+    x_grid -- array, x position of the grid cells.
+    y_grid -- array, y position of the grid cells.
+    '''
+    event_ids = list(event_ids)
+    
+    field_dims = (105, 68)
+    n_grid_cell_y = int(n_grid_cell_x * field_dims[1] / field_dims[0])
+    x_grid = np.linspace(-field_dims[0] / 2, field_dims[0] / 2, n_grid_cell_x)
+    y_grid = np.linspace(-field_dims[1] / 2, field_dims[1] / 2, n_grid_cell_y)
+    
+    ## making sure the processed tracking data is there before starting the workers
+    result = process_game(data_dir, game_id, cache_dir=cache_dir, max_speed=12, window=7)
+    
+    ## preallocating the output array
+    shape = (len(event_ids), n_grid_cell_y, n_grid_cell_x)
+    if out_loc is None:
+        surfaces = np.empty(shape, dtype=np.float32)
+    else:
+        surfaces = np.lib.format.open_memmap(out_loc, mode='w+', dtype=np.float32, shape=shape)
+        surfaces.flush()
+    
+    if n_workers is None:
+        n_workers = os.cpu_count()
+    n_workers = max(1, min(n_workers, len(event_ids)))
+    
+    print('Computing {} pitch control surfaces on {} workers'.format(len(event_ids), n_workers))
+    start_time = time.perf_counter()
+    
+    n_done = 0
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=load_worker_tracking, initargs=(result,)) as executor:
+        ## only the rows of each chunk are sent to the workers
+        futures = [executor.submit(pitch_control_chunk, event_data.loc[event_ids[start: start + chunk_size]],
+                                   start, params, n_grid_cell_x, out_loc)
+                   for start in range(0, len(event_ids), chunk_size)]
+        
+        for future in as_completed(futures):
+            start, chunk = future.result()
+            if chunk is not None:
+                surfaces[start: start + len(chunk)] = chunk
+                n_done += len(chunk)
+            else:
+                n_done += len(event_ids[start: start + chunk_size])
+            
+            seconds = time.perf_counter() - start_time
+            print('{}/{} events done, {:.1f} events/s'.format(n_done, len(event_ids), n_done / seconds))
+    
+    print('All events done in {:.2f}s'.format(time.perf_counter() - start_time))
+    
+    if out_loc is not None:
+        ## opening again so the workers' writes are seen
+        surfaces = np.load(out_loc, mmap_mode='r')
+    
+    return surfaces, x_grid, y_grid
+
+def read_processed_game(data_dir, game_id, cache_dir=None):
+    '''
+    Function to get the event data and the tracking data with velocities of a game,
+    all converted to metric values and with the second half reversed.
+    
+    Arguments:
+    data_dir -- str, the directory where the sample games are present.
+    game_id -- int, the sample game id to be analyzed.
+    cache_dir -- str, directory for the cache files,
+                 None for a 'cache' folder next to the csv file.
+    
+    Returns:
+    event_data -- dataframe object, event data.
+    tracking_home -- dataframe object, tacking data for home team(copy on write memory map).
+    tracking_away -- dataframe object, tracking data for away team(copy on write memory map).
+    '''
+    ## tracking data with velocities, converted and with the second half reversed
+    result = process_game(data_dir, game_id, cache_dir=cache_dir)
+    tracking_home, tracking_away = load_processed_game(result)
+    
+    ## event data in the same frame of reference
+    event_data = ufio.convert_values(ufio.read_event_data(data_dir, game_id))
+    ufio.CoordinateTransform(event_data.columns).apply(event_data, reverse=True, convert=False)
+    
+    return event_data, tracking_home, tracking_away
+
+def pass_probability_table(data_dir, game_id, params=None, event_types=('PASS',), cache_dir=None):
+    '''
+    Function to score every pass of a game with its probability of success,
+    i.e. pitch control of the attacking team at the end location of the pass.
+    The table is saved as a csv file next to the event data.
+    
+    Arguments:
+    data_dir -- str, the directory where the sample games are present.
+    game_id -- int, the sample game id to be analyzed.
+    params -- dict, default parameters for our model, None for default_model_params().
+    event_types -- tuple, event types to be scored, e.g. ('PASS', 'BALL LOST').
+    cache_dir -- str, directory for the cache files,
+                 None for a 'cache' folder next to the csv file.
+    
+    Returns:
+    table -- dataframe object, one row for each pass, indexed by event id.
+    out_loc -- str, location of the saved csv file.
+    '''
+    start_time = time.perf_counter()
+    
+    if params is None:
+        params = ufpc.default_model_params()
+    
+    event_data, tracking_home, tracking_away = read_processed_game(data_dir, game_id, cache_dir)
+    
+    passes = event_data.loc[event_data['Type'].isin(event_types)]
+    
+    ## scoring all the passes at once
+    PPCF_att, PPCF_def = ufpc.pass_success_probability(passes, tracking_home, tracking_away, params)
+    
+    columns = ['Team', 'Type', 'Subtype', 'Period', 'Start Frame', 'From', 'To',
+               'Start X', 'Start Y', 'End X', 'End Y']
+    table = passes[columns].copy()
+    table['PPCF_att'] = PPCF_att
+    table['PPCF_def'] = PPCF_def
+    table.index.name = 'Event'
+    
+    ## saving next to the event data
+    out_loc = data_dir + '/Sample_Game_{0}/Sample_Game_{0}_PassProbability.csv'.format(game_id)
+    table.to_csv(out_loc)
+    
+    print('Game {}: {} passes scored in {:.2f}s'.format(game_id, len(table), time.perf_counter() - start_time))
+    
+    return table, out_loc
+
+def load_worker_states(game_states):
+    '''
+    Function run once in every worker process for keeping the pass states
+    of all the games, so they are not sent again for every candidate.
+    
+    Arguments:
+    game_states -- list, (states, success) for each game, see calibrate_model_params.
+    '''
+    worker_states['games'] = game_states
+
+def pass_log_likelihood(game_states, params, eps=1e-6):
+    '''
+    Function to compute the log-likelihood of the observed pass outcomes
+    under the pitch control model.
+    
+    Arguments:
+    game_states -- list, (states, success) for each game, states are
+                   returned by pass_player_states and success is an array
+                   of 1 for a successful pass and 0 for a failed one.
+    params -- dict, default parameters for our model.
+    eps -- float, probabilities are clipped to [eps, 1 - eps].
+    
+    Returns:
+    log_likelihood -- float, sum of the log-likelihood of every pass.
+    '''
+    log_likelihood = 0.0
+    
+    for states, success in game_states:
+        PPCF_att, _ = ufpc.pass_probability_from_states(states, len(success), params)
+        
+        ## passes with no end location are left out
+        valid = ~np.isnan(PPCF_att)
+        prob = np.clip(PPCF_att[valid], eps, 1 - eps)
+        log_likelihood += np.sum(np.where(success[valid] == 1, np.log(prob), np.log(1 - prob)))
+    
+    return log_likelihood
+
+def evaluate_candidate(candidate):
+    '''
+    Function to compute the log-likelihood for one set of parameters
+    in a worker process.
+    
+    Arguments:
+    candidate -- dict, keyword arguments for default_model_params.
+    
+    Returns:
+    candidate -- dict, same as the argument.
+    log_likelihood -- float, sum of the log-likelihood of every pass.
+    '''
+    params = ufpc.default_model_params(**candidate)
+    
+    return candidate, pass_log_likelihood(worker_states['games'], params)
+
+def calibrate_model_params(data_dir, game_ids, param_grid=None, n_workers=None, cache_dir=None):
+    '''
+    Function to fit reaction_time, sigma, lambda_att and kappa_def of the pitch
+    control model by maximum likelihood over a grid of candidate values.
+    
+    A 'PASS' event is taken as a successful pass and a 'BALL LOST' event as a
+    failed one, the likelihood is of the attacking team controlling the ball
+    at the end location. The player states of every pass are made once and
+    reused for all the candidates, the candidates are spread on a process pool.
+    
+    Arguments:
+    data_dir -- str, the directory where the sample games are present.
+    game_ids -- list, the sample game ids to be used.
+    param_grid -- dict, candidate values for each parameter, e.g. {'sigma': [0.35, 0.45]},
+                  parameters not given keep their default value, None for a small grid around the defaults.
+    n_workers -- int, number of worker processes, None for the number of cpus.
+    cache_dir -- str, directory for the cache files,
+                 None for a 'cache' folder next to the csv file.
+    
+    Returns:
+    params -- dict, model parameters with the highest log-likelihood.
+    results -- dataframe object, log-likelihood of every candidate, best first.
+    '''
+    if param_grid is None:
+        param_grid = {'reaction_time': [0.5, 0.7, 0.9], 'sigma': [0.35, 0.45, 0.55],
+                      'lambda_att': [3.3, 4.3, 5.3], 'kappa_def': [1.42, 1.72, 2.02]}
+    
+    start_time = time.perf_counter()
+    
+    ## player states of every pass, made once for all the candidates
+    game_states = []
+    for game_id in game_ids:
+        event_data, tracking_home, tracking_away = read_processed_game(data_dir, game_id, cache_dir)
+        passes = event_data.loc[event_data['Type'].isin(['PASS', 'BALL LOST'])]
+        
+        success = (passes['Type'] == 'PASS').values.astype(np.int64)
+        states = ufpc.pass_player_states(passes, tracking_home, tracking_away)
+        game_states.append((states, success))
+    
+    n_passes = sum(len(success) for _, success in game_states)
+    
+    ## every combination of the candidate values
+    keys = list(param_grid.keys())
+    candidates = [dict(zip(keys, values)) for values in itertools.product(*param_grid.values())]
+    
+    if n_workers is None:
+        n_workers = os.cpu_count()
+    n_workers = max(1, min(n_workers, len(candidates)))
+    
+    print('Evaluating {} candidates over {} passes on {} workers'.format(len(candidates), n_passes, n_workers))
+    
+    rows = []
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=load_worker_states, initargs=(game_states,)) as executor:
+        futures = [executor.submit(evaluate_candidate, candidate) for candidate in candidates]
+        
+        for future in as_completed(futures):
+            candidate, log_likelihood = future.result()
+            rows.append(dict(candidate, log_likelihood=log_likelihood))
+            
+            if len(rows) % max(1, len(candidates) // 10) == 0 or len(rows) == len(candidates):
+                seconds = time.perf_counter() - start_time
+                print('{}/{} candidates done, {:.1f} candidates/s'.format(len(rows), len(candidates), len(rows) / seconds))
+    
+    results = pd.DataFrame(rows).sort_values('log_likelihood', ascending=False).reset_index(drop=True)
+    
+    ## parameters with the highest log-likelihood
+    best = {key: float(results.loc[0, key]) for key in keys}
+    params = ufpc.default_model_params(**best)
+    
+    print('Best candidate {} with log-likelihood {:.2f}, done in {:.2f}s'.format(best, results.loc[0, 'log_likelihood'],
+                                                                             time.perf_counter() - start_time))
+    
+    return params, results
@@ -5,16 +5,27 @@ Created on Sun Apr 19 13:22:33 2020
 @author: slothfulwave612
 
 This Python file contain function for input output
-operation for event and tracking data.
+operation for event and tracking data, and for storing
+pitch control surfaces.
 
-Modules Used(2):
+Modules Used(7):
 ----------------
 1. pandas -- Python library for data manipulation and analysis.
 2. csv -- Python module for comma seperated file manipulation.
+3. numpy -- numerical computing library.
+4. os -- for interacting with the operating system.
+5. glob -- for finding files matching a pattern.
+6. hashlib -- for making the cache keys.
+7. concurrent.futures -- for reading the files on a thread pool.
 """
 
 import pandas as pd
+import numpy as np
 import csv
+import os
+import glob
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
 def read_event_data(data_dir, game_id):
     '''
@@ -32,7 +43,145 @@ def read_event_data(data_dir, game_id):
     
     return event_data
 
-def convert_values(df):
+def pitch_frame_coefficients(frame_name, field_dims=(105, 68)):
+    '''
+    Function to get the scale and offset that take x and y values of a pitch
+    frame to metric values, i.e. x_metric = x * scale[0] + offset[0] and the
+    same for y.
+    
+    ------------ ***NOTE*** ------------
+    Metrica and StatsBomb define the origin at the *top*-left of the field,
+    metric values have the origin at the center with y going up.
+    ------------ ********** ------------
+    
+    Arguments:
+    frame_name -- str, 'metrica'(0 to 1), 'statsbomb'(120 x 80 yards) or 'metric'(meters).
+    field_dims -- tuple, length and width of the field in meters.
+    
+    Returns:
+    scale -- array, (x scale, y scale).
+    offset -- array, (x offset, y offset).
+    '''
+    if frame_name == 'metrica':
+        frame_dims = (1, 1)
+    elif frame_name == 'statsbomb':
+        frame_dims = (120, 80)
+    elif frame_name == 'metric':
+        return np.ones(2), np.zeros(2)
+    else:
+        assert False, "Pitch frame must be one of metrica, statsbomb or metric"
+    
+    scale = np.array([field_dims[0] / frame_dims[0], -field_dims[1] / frame_dims[1]])
+    offset = np.array([-field_dims[0] / 2, field_dims[1] / 2])
+    
+    return scale, offset
+
+def transform_array(values, scale, offset, flip=None, shift=None):
+    '''
+    Function to apply scale, offset, sign flip and shift to an array in place,
+    i.e. values = sign * (values * scale + offset) + shift.
+    
+    The flip is a mirror around the origin of the metric frame, so scale and
+    offset must take the values to metric values divided by the target scale,
+    and shift moves them from there to the target frame.
+    
+    Arguments:
+    values -- array, first axis is frames and last axis matches scale and offset.
+    scale -- array, multiplied along the last axis.
+    offset -- array, added along the last axis.
+    flip -- bool array, True for the frames to be multiplied by -1, None for no flip.
+    shift -- array, added along the last axis after the flip, None for no shift.
+    
+    Returns:
+    values -- array, the same array after the transform.
+    '''
+    if flip is not None:
+        ## sign of each frame, put in front so one multiply does both
+        sign = np.where(flip, -1.0, 1.0).reshape((-1,) + (1,) * (values.ndim - 1))
+        np.multiply(values, sign * scale, out=values)
+        np.add(values, sign * offset, out=values)
+    else:
+        np.multiply(values, scale, out=values)
+        np.add(values, offset, out=values)
+    
+    if shift is not None:
+        np.add(values, shift, out=values)
+    
+    return values
+
+class CoordinateTransform:
+    '''
+    class that finds the x and y columns of a dataframe once and converts
+    them between pitch frames, with an optional flip of the second half.
+    '''
+    
+    def __init__(self, columns, from_frame='metrica', to_frame='metric', field_dims=(105, 68)):
+        '''
+        Function to initialize CoordinateTransform class objects.
+        
+        Arguments:
+        self -- represents the object of the class.
+        columns -- list, column names of the dataframe.
+        from_frame -- str, pitch frame of the values, 'metrica', 'statsbomb' or 'metric'.
+        to_frame -- str, pitch frame wanted, 'metrica', 'statsbomb' or 'metric'.
+        field_dims -- tuple, length and width of the field in meters.
+        '''
+        ## making list for Start and End positions for both X and Y
+        self.columns = [cols for cols in columns if cols[-1] in ['X', 'Y']]
+        is_x = np.array([cols[-1] == 'X' for cols in self.columns])
+        
+        ## going to metric values and then from metric values to the wanted frame,
+        ## the shift is kept apart so the second half is flipped in metric space
+        from_scale, from_offset = pitch_frame_coefficients(from_frame, field_dims)
+        to_scale, to_offset = pitch_frame_coefficients(to_frame, field_dims)
+        scale = from_scale / to_scale
+        offset = from_offset / to_scale
+        shift = -to_offset / to_scale
+        
+        ## one value for each column
+        self.scale = np.where(is_x, scale[0], scale[1])
+        self.offset = np.where(is_x, offset[0], offset[1])
+        self.shift = np.where(is_x, shift[0], shift[1]) if np.any(shift) else None
+    
+    def apply(self, df, reverse=False, convert=True):
+        '''
+        Function to transform the x and y columns of a dataframe.
+        All the columns are taken out as one array, transformed in place
+        and written back into the existing float columns. Columns that are
+        read-only(e.g. memory mapped with mmap_mode='r') are replaced instead.
+        
+        Arguments:
+        self -- represents the object of the class.
+        df -- dataframe object, having the columns given at initialization.
+        reverse -- bool, True for flipping the values in the second half.
+        convert -- bool, True for changing the pitch frame, False for only the flip.
+        
+        Returns:
+        df -- dataframe object
+        '''
+        values = df[self.columns].to_numpy(dtype=np.float64, copy=True)
+        
+        flip = (df['Period'].values == 2) if reverse else None
+        
+        if convert:
+            transform_array(values, self.scale, self.offset, flip, self.shift)
+        elif flip is not None:
+            values[flip] *= -1
+        
+        if (df.dtypes[self.columns] == np.float64).all():
+            try:
+                ## writing into the existing float block, no new columns are made
+                df.loc[:, self.columns] = values
+                return df
+            except (TypeError, ValueError):
+                ## block is a read-only memory map, see read_cache
+                pass
+        
+        df[self.columns] = values
+        
+        return df
+
+def convert_values(df, from_frame='metrica'):
     '''
     Converting the values to metric values.
     
@@ -42,51 +191,125 @@ def convert_values(df):
     
     Argument:
     df -- dataframe object
+    from_frame -- str, pitch frame of the values, 'metrica', 'statsbomb' or 'metric'.
     
     Returns:
     df -- dataframe object
     '''
-    ## our field dimensions
-    field_dims = (105, 68)
+    return CoordinateTransform(df.columns, from_frame=from_frame).apply(df)
     
-    ## making list for Start and End positions for both X and Y
-    x_cols = [col for col in df.columns if col[-1] == 'X']
-    y_cols = [col for col in df.columns if col[-1] == 'Y']
+def cache_paths(file_loc, cache_dir=None, tag='', extra=''):
+    '''
+    Function to get the cache file locations for a tracking data file.
+    The key is made from the absolute path, size and modification time
+    of the csv file, so an edited or replaced file never hits an old entry.
     
-    ## here converting the units
-    df[x_cols] = (df[x_cols] - 0.5) * field_dims[0]
-    df[y_cols] = -1 * (df[y_cols] - 0.5) * field_dims[1]
+    Arguments:
+    file_loc -- str, location of the tracking csv file.
+    cache_dir -- str, directory for the cache files,
+                 None for a 'cache' folder next to the csv file.
+    tag -- str, added to the file name, for keeping data derived from the csv file.
+    extra -- str, added to the key, e.g. parameters used for making derived data.
     
-    return df
+    Returns:
+    values_loc -- str, location of the .npy file having the numeric values.
+    columns_loc -- str, location of the .npy file having the column names.
+    '''
+    ## making the key from path, size and modification time
+    stat = os.stat(file_loc)
+    key = '{}|{}|{}|{}'.format(os.path.abspath(file_loc), stat.st_size, stat.st_mtime_ns, extra)
+    key = hashlib.md5(key.encode()).hexdigest()[:16]
     
-def read_tracking_data(data_dir, game_id, team_name):
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(file_loc), 'cache')
+    
+    stem = os.path.splitext(os.path.basename(file_loc))[0] + tag
+    values_loc = os.path.join(cache_dir, '{}_{}.npy'.format(stem, key))
+    columns_loc = os.path.join(cache_dir, '{}_{}_columns.npy'.format(stem, key))
+    
+    return values_loc, columns_loc
+
+def write_cache(track_frame, values_loc, columns_loc):
     '''
-    Function to read in the tracking data.
+    Function to save a tracking dataframe as binary .npy files.
+    Older entries for the same csv file are deleted.
     
     Arguments:
-    data_dir -- str, the directory where the sample games are present.
-    game_id -- int, the sample game id to be analyzed.
-    team_name -- str, home team or away team
+    track_frame -- dataframe object, tracking data indexed by frame.
+    values_loc -- str, location of the .npy file having the numeric values.
+    columns_loc -- str, location of the .npy file having the column names.
+    '''
+    cache_dir = os.path.dirname(values_loc)
+    os.makedirs(cache_dir, exist_ok=True)
+    
+    ## deleting old entries of the same file, i.e. the ones with another key
+    prefix = values_loc[:-len('.npy')]
+    stem = prefix[:-len('_0123456789abcdef')]
+    for old_file in glob.glob(glob.escape(stem) + '_' + '[0-9a-f]' * 16 + '*'):
+        if not old_file.startswith(prefix):
+            os.remove(old_file)
+    
+    ## frame number is saved as the first column
+    columns = np.array([track_frame.index.name] + list(track_frame.columns))
+    values = np.column_stack([track_frame.index.values, track_frame.values]).astype(np.float64)
+    
+    ## writing to a temporary file first so that a half written
+    ## cache is never read, values file is written last
+    for arr, file_loc in zip([columns, values], [columns_loc, values_loc]):
+        temp_loc = file_loc + '.tmp'
+        with open(temp_loc, 'wb') as temp_file:
+            np.save(temp_file, arr)
+        os.replace(temp_loc, file_loc)
+
+def read_cache(values_loc, columns_loc, mmap_mode=None):
+    '''
+    Function to load a tracking dataframe from the binary .npy files.
+    With mmap_mode the float columns stay backed by the memory mapped file,
+    only the 'Period' column is copied. With mmap_mode='r' the columns are
+    read-only, use 'c'(copy on write) if the values are to be changed in place.
+    
+    Arguments:
+    values_loc -- str, location of the .npy file having the numeric values.
+    columns_loc -- str, location of the .npy file having the column names.
+    mmap_mode -- str, passed to np.load, None to read the whole array in memory,
+                 'r' for read only and 'c' for copy on write.
     
     Returns:
-    the event data
+    track_frame -- dataframe object, tracking data indexed by frame.
     '''
-    ## setting the path of our file
-    file_name = 'Sample_Game_{}_RawTrackingData_{}_Team.csv'.format(game_id, team_name)
-    file_loc = data_dir + '/Sample_Game_' + str(game_id) + '/' + file_name 
+    columns = np.load(columns_loc).tolist()
+    values = np.load(values_loc, mmap_mode=mmap_mode)
     
-    ## creating a csv file reader
-    csv_file = open(file_loc, 'r') 
-    reader = csv.reader(csv_file)
+    index = pd.Index(values[:, 0].astype(np.int64), name=columns[0])
+    track_frame = pd.DataFrame(values[:, 1:], index=index, columns=columns[1:], copy=False)
+    track_frame['Period'] = track_frame['Period'].astype(np.int64)
     
-    ## 3rd element in the first line will tell whether the 
-    ## team is Home team or Away Team
-    teamname = next(reader)[3]
-    print('Reading content for {} team'.format(teamname))
+    return track_frame
+
+def read_tracking_columns(file_loc, team_name):
+    '''
+    Function to read the three header lines of a tracking data file
+    and make the column names.
     
-    ## jersey name of each player
-    jerseys = [j_name for j_name in next(reader) if j_name != '']
-    columns = next(reader)
+    Arguments:
+    file_loc -- str, location of the tracking csv file.
+    team_name -- str, home team or away team
+    
+    Returns:
+    columns -- list, column names for the tracking dataframe.
+    '''
+    ## creating a csv file reader
+    with open(file_loc, 'r') as csv_file:
+        reader = csv.reader(csv_file)
+        
+        ## 3rd element in the first line will tell whether the 
+        ## team is Home team or Away Team
+        teamname = next(reader)[3]
+        print('Reading content for {} team'.format(teamname))
+        
+        ## jersey name of each player
+        jerseys = [j_name for j_name in next(reader) if j_name != '']
+        columns = next(reader)
     
     ## formatting the names in the columns list
     for i, j in enumerate(jerseys):
@@ -97,10 +320,307 @@ def read_tracking_data(data_dir, game_id, team_name):
     columns[-2] = 'ball_X'
     columns[-1] = 'ball_Y'
     
+    return columns
+
+def read_tracking_data(data_dir, game_id, team_name, use_cache=True, cache_dir=None):
+    '''
+    Function to read in the tracking data.
+    
+    The first read of a file parses the csv and saves the values as binary
+    .npy files, later reads of the same file load the binary copy instead.
+    
+    Arguments:
+    data_dir -- str, the directory where the sample games are present.
+    game_id -- int, the sample game id to be analyzed.
+    team_name -- str, home team or away team
+    use_cache -- bool, True for reading from and writing to the cache.
+    cache_dir -- str, directory for the cache files,
+                 None for a 'cache' folder next to the csv file.
+    
+    Returns:
+    the event data
+    '''
+    ## setting the path of our file
+    file_name = 'Sample_Game_{}_RawTrackingData_{}_Team.csv'.format(game_id, team_name)
+    file_loc = data_dir + '/Sample_Game_' + str(game_id) + '/' + file_name 
+    
+    if use_cache:
+        values_loc, columns_loc = cache_paths(file_loc, cache_dir)
+        
+        if os.path.exists(values_loc) and os.path.exists(columns_loc):
+            print('Reading cached content for {} team'.format(team_name))
+            return read_cache(values_loc, columns_loc)
+    
+    columns = read_tracking_columns(file_loc, team_name)
+    
     track_frame = pd.read_csv(file_loc, names=columns, index_col='Frame', skiprows=3)
     
+    if use_cache:
+        write_cache(track_frame, values_loc, columns_loc)
+    
     return track_frame
     
+def read_tracking_window(data_dir, game_id, team_name, start_frame, end_frame, players=None, chunksize=5000):
+    '''
+    Function to read in the tracking data for a range of frames only.
+    
+    The csv file is read in chunks and reading stops as soon as a chunk
+    goes past end_frame, so memory used depends on the length of the clip
+    and not on the length of the match.
+    
+    Arguments:
+    data_dir -- str, the directory where the sample games are present.
+    game_id -- int, the sample game id to be analyzed.
+    team_name -- str, home team or away team
+    start_frame -- int, first frame to be read.
+    end_frame -- int, last frame to be read(included, same as .loc).
+    players -- list, player ids like 'Home_11' to be read, None for all the players.
+    chunksize -- int, number of rows read at a time.
+    
+    Returns:
+    track_frame -- dataframe object, tracking data for the given frames.
+    '''
+    ## setting the path of our file
+    file_name = 'Sample_Game_{}_RawTrackingData_{}_Team.csv'.format(game_id, team_name)
+    file_loc = data_dir + '/Sample_Game_' + str(game_id) + '/' + file_name 
+    
+    columns = read_tracking_columns(file_loc, team_name)
+    
+    ## selecting the columns for the required players
+    if players is None:
+        usecols = columns
+    else:
+        player_cols = [cols for pid in players for cols in (pid + '_X', pid + '_Y')]
+        missing = [cols for cols in player_cols if cols not in columns]
+        assert len(missing) == 0, "Players not found: {}".format(missing)
+        usecols = columns[:3] + player_cols + ['ball_X', 'ball_Y']
+    
+    chunks = []
+    reader = pd.read_csv(file_loc, names=columns, usecols=usecols, skiprows=3, chunksize=chunksize)
+    
+    with reader:
+        for chunk in reader:
+            frames = chunk['Frame'].values
+            
+            ## keeping only the rows inside the window
+            keep = (frames >= start_frame) & (frames <= end_frame)
+            if keep.any():
+                chunks.append(chunk.loc[keep])
+            
+            ## frames are in increasing order, so we can stop here
+            if frames[-1] >= end_frame:
+                break
+    
+    if len(chunks) == 0:
+        track_frame = pd.DataFrame(columns=usecols).set_index('Frame')
+    else:
+        track_frame = pd.concat(chunks).set_index('Frame')
+    
+    return track_frame[[cols for cols in usecols if cols != 'Frame']]
+    
+def read_tracking_tensor(data_dir, game_id, team_name, cache_dir=None, mmap_mode='r'):
+    '''
+    Function to read in the tracking data as a float32 array of shape
+    (n_frames, n_players, 2) instead of the wide dataframe.
+    
+    The array is saved next to the cache of read_tracking_data and loaded
+    with np.memmap, so slicing it by frames or players does not copy data.
+    Player ids follow the column order of the tracking dataframe.
+    
+    Arguments:
+    data_dir -- str, the directory where the sample games are present.
+    game_id -- int, the sample game id to be analyzed.
+    team_name -- str, home team or away team
+    cache_dir -- str, directory for the cache files,
+                 None for a 'cache' folder next to the csv file.
+    mmap_mode -- str, passed to np.load, 'r' for read only, 'c' for copy on write
+                 and 'r+' for writing back to the file.
+    
+    Returns:
+    positions -- np.memmap, float32 array of (x, y) values for each frame and player.
+    meta -- dict, having 'player_ids', 'frames', 'period', 'time' and 'ball'(n_frames, 2) arrays.
+    '''
+    ## setting the path of our file
+    file_name = 'Sample_Game_{}_RawTrackingData_{}_Team.csv'.format(game_id, team_name)
+    file_loc = data_dir + '/Sample_Game_' + str(game_id) + '/' + file_name 
+    
+    values_loc, columns_loc = cache_paths(file_loc, cache_dir)
+    tensor_loc = values_loc[:-len('.npy')] + '_tensor.npy'
+    meta_loc = values_loc[:-len('.npy')] + '_meta.npz'
+    
+    if not (os.path.exists(tensor_loc) and os.path.exists(meta_loc)):
+        track_frame = read_tracking_data(data_dir, game_id, team_name, cache_dir=cache_dir)
+        
+        ## getting the player ids
+        x_cols = [cols for cols in track_frame.columns if cols[-1] == 'X' and cols != 'ball_X']
+        player_ids = np.array([cols[:-2] for cols in x_cols])
+        y_cols = [pid + '_Y' for pid in player_ids]
+        
+        ## making the (n_frames, n_players, 2) array
+        positions = np.stack([track_frame[x_cols].values, track_frame[y_cols].values], axis=-1)
+        positions = np.ascontiguousarray(positions, dtype=np.float32)
+        
+        with open(meta_loc + '.tmp', 'wb') as temp_file:
+            np.savez(temp_file, player_ids=player_ids, frames=track_frame.index.values,
+                     period=track_frame['Period'].values, time=track_frame['Time [s]'].values,
+                     ball=track_frame[['ball_X', 'ball_Y']].values.astype(np.float32))
+        os.replace(meta_loc + '.tmp', meta_loc)
+        
+        with open(tensor_loc + '.tmp', 'wb') as temp_file:
+            np.save(temp_file, positions)
+        os.replace(tensor_loc + '.tmp', tensor_loc)
+    
+    positions = np.load(tensor_loc, mmap_mode=mmap_mode)
+    with np.load(meta_loc) as meta_file:
+        meta = {key: meta_file[key] for key in meta_file.files}
+    
+    return positions, meta
+    
+class MatchTracking:
+    '''
+    class holding the tracking data of both the teams and the ball,
+    aligned on frame number and stored in one numeric block.
+    '''
+    
+    def __init__(self, frames, period, time, player_ids, block, n_home):
+        '''
+        Function to initialize MatchTracking class objects.
+        
+        Arguments:
+        self -- represents the object of the class.
+        frames -- array, frame numbers.
+        period -- array, period of each frame.
+        time -- array, time(in seconds) of each frame.
+        player_ids -- list, player ids, home players first and then away players.
+        block -- array of shape (n_frames, n_players + 1, 2), (x, y) of each player, ball is the last one.
+        n_home -- int, number of home players.
+        '''
+        self.frames = frames
+        self.period = period
+        self.time = time
+        self.player_ids = list(player_ids)
+        self.block = block
+        self.n_home = n_home
+    
+    @property
+    def positions(self):
+        '''
+        (n_frames, n_players, 2) view of the player positions, home then away.
+        '''
+        return self.block[:, :-1]
+    
+    @property
+    def home(self):
+        '''
+        (n_frames, n_home, 2) view of the home player positions.
+        '''
+        return self.block[:, :self.n_home]
+    
+    @property
+    def away(self):
+        '''
+        (n_frames, n_away, 2) view of the away player positions.
+        '''
+        return self.block[:, self.n_home:-1]
+    
+    @property
+    def ball(self):
+        '''
+        (n_frames, 2) view of the ball position.
+        '''
+        return self.block[:, -1]
+    
+    def team_frame(self, team_name):
+        '''
+        Function to make the wide tracking dataframe for a team, same as
+        the one returned by read_tracking_data, so it can be used with
+        the velocity, pitch control and plot functions.
+        
+        Arguments:
+        self -- represents the object of the class.
+        team_name -- str, 'Home' or 'Away'.
+        
+        Returns:
+        track_frame -- dataframe object, tracking data for the team.
+        '''
+        if team_name == 'Home':
+            player_ids, positions = self.player_ids[:self.n_home], self.home
+        elif team_name == 'Away':
+            player_ids, positions = self.player_ids[self.n_home:], self.away
+        else:
+            assert False, "Team must be either home or away"
+        
+        columns = [cols for pid in player_ids for cols in (pid + '_X', pid + '_Y')]
+        
+        track_frame = pd.DataFrame(positions.reshape(len(self.frames), -1), columns=columns,
+                                   index=pd.Index(self.frames, name='Frame'))
+        track_frame.insert(0, 'Period', self.period)
+        track_frame.insert(1, 'Time [s]', self.time)
+        track_frame['ball_X'] = self.ball[:, 0]
+        track_frame['ball_Y'] = self.ball[:, 1]
+        
+        return track_frame
+
+def read_match_tracking(data_dir, game_id, convert=True, reverse=True, cache_dir=None):
+    '''
+    Function to read in the tracking data for both the teams in one go.
+    
+    Both files are read at the same time on a thread pool and aligned on
+    frame number. Metric conversion and the second half flip are then done
+    once on the shared numeric block instead of once per dataframe.
+    
+    Arguments:
+    data_dir -- str, the directory where the sample games are present.
+    game_id -- int, the sample game id to be analyzed.
+    convert -- bool, True for converting the values to metric values.
+    reverse -- bool, True for reversing the direction of play in the second half.
+    cache_dir -- str, directory for the cache files,
+                 None for a 'cache' folder next to the csv file.
+    
+    Returns:
+    match -- MatchTracking object, tracking data for both teams and the ball.
+    '''
+    ## reading both the files on a thread pool
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(read_tracking_data, data_dir, game_id, team_name, cache_dir=cache_dir)
+                   for team_name in ['Home', 'Away']]
+        tracking_home, tracking_away = [future.result() for future in futures]
+    
+    ## keeping only the frames present in both the files
+    frames, home_idx, away_idx = np.intersect1d(tracking_home.index.values, tracking_away.index.values,
+                                                assume_unique=True, return_indices=True)
+    
+    ## getting the player ids
+    player_ids = []
+    for team in [tracking_home, tracking_away]:
+        player_ids += [cols[:-2] for cols in team.columns if cols[-1] == 'X' and cols != 'ball_X']
+    n_home = len([pid for pid in player_ids if pid.startswith('Home')])
+    
+    ## making the shared (n_frames, n_players + 1, 2) block, ball is the last one
+    block = np.empty((len(frames), len(player_ids) + 1, 2))
+    
+    team_slices = [slice(0, n_home), slice(n_home, len(player_ids))]
+    
+    for team, team_idx, team_slice in zip([tracking_home, tracking_away], [home_idx, away_idx], team_slices):
+        columns = [cols for pid in player_ids[team_slice] for cols in (pid + '_X', pid + '_Y')]
+        block[:, team_slice] = team[columns].values[team_idx].reshape(len(frames), -1, 2)
+    
+    block[:, -1] = tracking_home[['ball_X', 'ball_Y']].values[home_idx]
+    
+    period = tracking_home['Period'].values[home_idx]
+    time = tracking_home['Time [s]'].values[home_idx]
+    
+    ## converting the values and flipping the second half in one go,
+    ## home team always attacks from right -> left
+    flip = (period == 2) if reverse else None
+    if convert:
+        scale, offset = pitch_frame_coefficients('metrica')
+        transform_array(block, scale, offset, flip)
+    elif reverse:
+        block[flip] *= -1
+    
+    return MatchTracking(frames, period, time, player_ids, block, n_home)
+    
 def rev_direction(event_data, tracking_home, tracking_away):
     '''
     Function to reverse the direction of play for the second half
@@ -116,13 +636,177 @@ def rev_direction(event_data, tracking_home, tracking_away):
     tracking_away -- dataframe object, tracking data for away team.
     '''
     for data in [event_data, tracking_home, tracking_away]:
-        second_half_id = data['Period'].idxmax(2)
-        ## getting the starting frame of second half
+        ## flipping x and y position of ball and players for the second half
+        CoordinateTransform(data.columns).apply(data, reverse=True, convert=False)
+    
+    return event_data, tracking_home, tracking_away
+    
+
+def write_surface_store(store_dir, surfaces, event_ids, frames, x_grid, y_grid, dtype='uint8', chunk_size=256):
+    '''
+    Function to save many pitch control surfaces in a compressed store that
+    can be read one surface at a time, see SurfaceStore.
+    
+    ------------ ***NOTE*** ------------
+    With dtype 'uint8' values are clipped to [0, 1] and saved in steps of 1/255,
+    with 'float16' they are saved with about three significant digits.
+    ------------ ********** ------------
+    
+    Arguments:
+    store_dir -- str, directory for the store, made if not there.
+    surfaces -- array of shape (n_events, ny, nx), e.g. from pitch_control_for_events, can be a memmap.
+    event_ids -- list, event id of each surface.
+    frames -- list, frame number of each surface.
+    x_grid -- array, x position of the grid cells.
+    y_grid -- array, y position of the grid cells.
+    dtype -- str, 'uint8' or 'float16'.
+    chunk_size -- int, number of surfaces converted at a time.
+    
+    Returns:
+    store -- SurfaceStore object, the saved store opened for reading.
+    '''
+    if dtype not in ['uint8', 'float16']:
+        assert False, "dtype must be either 'uint8' or 'float16'"
+    
+    if len(surfaces) != len(event_ids) or len(surfaces) != len(frames):
+        assert False, "surfaces, event_ids and frames must have the same length"
+    
+    os.makedirs(store_dir, exist_ok=True)
+    
+    ## event id and frame of each surface, and the grid
+    index = np.column_stack([np.asarray(event_ids, dtype=np.int64), np.asarray(frames, dtype=np.int64)])
+    grid = np.array([x_grid[0], x_grid[-1], len(x_grid), y_grid[0], y_grid[-1], len(y_grid)], dtype=np.float64)
+    
+    for arr, name in zip([index, grid], ['index.npy', 'grid.npy']):
+        temp_loc = os.path.join(store_dir, name + '.tmp')
+        with open(temp_loc, 'wb') as temp_file:
+            np.save(temp_file, arr)
+        os.replace(temp_loc, os.path.join(store_dir, name))
+    
+    ## converting the surfaces chunk by chunk, surfaces file is written last
+    temp_loc = os.path.join(store_dir, 'surfaces.npy.tmp')
+    out = np.lib.format.open_memmap(temp_loc, mode='w+', dtype=dtype, shape=np.shape(surfaces))
+    for start in range(0, len(surfaces), chunk_size):
+        out[start: start + chunk_size] = SurfaceStore.quantize(np.asarray(surfaces[start: start + chunk_size]), dtype)
+    out.flush()
+    del out
+    os.replace(temp_loc, os.path.join(store_dir, 'surfaces.npy'))
+    
+    return SurfaceStore(store_dir)
+
+class SurfaceStore:
+    '''
+    class for reading pitch control surfaces saved by write_surface_store.
+    
+    The surfaces are memory mapped, so opening the store does not load
+    the match and a surface is read straight from the file when asked for.
+    '''
+    
+    def __init__(self, store_dir, mode='r'):
+        '''
+        Function to initialize SurfaceStore class objects.
+        
+        Arguments:
+        self -- represents the object of the class.
+        store_dir -- str, directory of the store.
+        mode -- str, 'r' for reading, 'r+' for also replacing surfaces with put.
+        '''
+        self.store_dir = store_dir
+        self.surfaces = np.load(os.path.join(store_dir, 'surfaces.npy'), mmap_mode=mode)
+        self.dtype = self.surfaces.dtype.name
+        
+        index = np.load(os.path.join(store_dir, 'index.npy'))
+        self.event_ids = index[:, 0]
+        self.frames = index[:, 1]
         
-        columns = [cols for cols in data.columns if cols[-1] in ['X', 'Y']]
-        ## getting columns for x and y position of ball and players
+        x_min, x_max, n_x, y_min, y_max, n_y = np.load(os.path.join(store_dir, 'grid.npy'))
+        self.x_grid = np.linspace(x_min, x_max, int(n_x))
+        self.y_grid = np.linspace(y_min, y_max, int(n_y))
         
-        data.loc[second_half_id:, columns] *= -1
+        ## row of each event id, and rows sorted by frame
+        self.event_rows = {event_id: row for row, event_id in enumerate(self.event_ids.tolist())}
+        self.frame_order = np.argsort(self.frames, kind='stable')
+        self.sorted_frames = self.frames[self.frame_order]
     
-    return event_data, tracking_home, tracking_away
+    @staticmethod
+    def quantize(values, dtype):
+        '''
+        Function to convert pitch control values to the store's dtype.
+        
+        Arguments:
+        values -- array, pitch control values.
+        dtype -- str, 'uint8' or 'float16'.
+        
+        Returns:
+        array, values in the given dtype.
+        '''
+        if dtype == 'uint8':
+            return np.rint(np.clip(np.nan_to_num(values), 0, 1) * 255).astype(np.uint8)
+        
+        return values.astype(np.float16)
+    
+    def dequantize(self, values):
+        '''
+        Function to convert values read from the store back to pitch control values.
+        
+        Arguments:
+        self -- represents the object of the class.
+        values -- array, values read from the store.
+        
+        Returns:
+        array, float32 pitch control values.
+        '''
+        if self.dtype == 'uint8':
+            return values.astype(np.float32) / 255
+        
+        return values.astype(np.float32)
+    
+    def __len__(self):
+        return len(self.event_ids)
+    
+    def by_event(self, event_id):
+        '''
+        Function to read the surface of an event.
+        
+        Arguments:
+        self -- represents the object of the class.
+        event_id -- int, event id.
+        
+        Returns:
+        surface -- array of shape (ny, nx), pitch control surface.
+        '''
+        if event_id not in self.event_rows:
+            assert False, "Event {} is not in the store".format(event_id)
+        
+        return self.dequantize(self.surfaces[self.event_rows[event_id]])
     
+    def by_frame(self, frame):
+        '''
+        Function to read all the surfaces of a frame.
+        
+        Arguments:
+        self -- represents the object of the class.
+        frame -- int, frame number.
+        
+        Returns:
+        event_ids -- array, event id of each surface.
+        surfaces -- array of shape (n, ny, nx), pitch control surfaces, n is 0 if there is none.
+        '''
+        start, end = np.searchsorted(self.sorted_frames, [frame, frame + 1])
+        rows = np.sort(self.frame_order[start: end])
+        
+        return self.event_ids[rows], self.dequantize(self.surfaces[rows])
+    
+    def put(self, event_id, surface):
+        '''
+        Function to replace the surface of an event, the store must be opened with mode 'r+'.
+        
+        Arguments:
+        self -- represents the object of the class.
+        event_id -- int, event id.
+        surface -- array of shape (ny, nx), pitch control surface.
+        '''
+        if event_id not in self.event_rows:
+            assert False, "Event {} is not in the store".format(event_id)
+        
+        self.surfaces[self.event_rows[event_id]] = self.quantize(np.asarray(surface), self.dtype)
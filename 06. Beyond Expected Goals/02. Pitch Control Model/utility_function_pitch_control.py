@@ -15,9 +15,97 @@ I have made notes on same on my GitHub Repository, more further explanation
 of the model you can check it out.
 """
 
+import hashlib
+from collections import OrderedDict
 import numpy as np
 
-def default_model_params(time_to_control = 3):
+
+class Player:
+    '''
+    class defining a player object that stores position, velocity, time-to-intercept and pitch control
+    contribution for a player.
+    '''
+    
+    def __init__(self, pid, team, team_name, params):
+        '''
+        Function to initialize Player class objects.
+        
+        Arguments:
+        self -- represents the object of the class.
+        pid -- player id.
+        team -- tracking frame.
+        team_name -- 'Home' or 'Away'.
+        params -- dictionary containing default parameters for pitch control model.
+        '''
+        self.id = pid
+        self.team_name = team_name
+        self.player_name = '{0}_{1}'.format(team_name, pid)
+        self.v_max = params['max_player_speed']  ## maximum player speed in m/s
+        self.reaction_time = params['reaction_time']
+        self.sigma = params['sigma']
+        self.get_position(team)
+        self.get_velocity(team)
+        self.PPCF = 0
+    
+    def get_position(self, team):
+        '''
+        Function to get the postion of the player.
+        If the position is NaN inframe will be set to False
+        
+        Arguments:
+        self -- represents the object of the class.
+        team -- tracking frame
+        '''
+        self.position = np.array([team[self.player_name + '_X'], team[self.player_name + '_Y']])
+        self.inframe = not np.any(np.isnan(self.position))
+    
+    def get_velocity(self, team):
+        '''
+        Function to get the velocity of the player.
+        If the velocity of the player is zero than set the velocity array to 0, 0 for x and y respectively.
+        
+        Arguments:
+        self -- represents the object of the class.
+        team -- tracking frame.
+        '''
+        self.velocity = np.array([team[self.player_name + '_vx'], team[self.player_name + '_vy']])
+        if np.any(np.isnan(self.velocity)):
+            self.velocity = np.array([0.0, 0.0])
+        
+    def time_to_intercept_fun(self, final_pos):
+        '''
+        Function that computes time to intercept value.
+        
+        Arguments:
+        self -- represents the object of the class.
+        final_pos -- time taken by the player to reach the final_position.
+        
+        ReturnsL
+        time_to_intercept -- time taken to intercept the ball.
+        '''
+        self.PPCF = 0.0
+        ## Time to intercept assumes that the player continues moving at current velocity for 'reaction_time'
+        ## and then runs at full speed to the target position.
+        
+        reaction = self.position + self.velocity * self.reaction_time
+        self.time_to_intercept = self.reaction_time + np.linalg.norm(final_pos - reaction) / self.v_max
+        
+        return self.time_to_intercept
+    
+    def probability_intercept_ball(self, arr_time):
+        '''
+        Function to compute the probability of a player to intercept the ball.
+        
+        Arguments:
+        self -- represents the object of the class.
+        arr_time -- time taken by the player to arrive at the target location of the ball.
+        '''
+        probab = 1 / (1 + np.exp(-np.pi / np.sqrt(3.0) / self.sigma * (arr_time - self.time_to_intercept)))
+        
+        return probab
+        
+
+def default_model_params(time_to_control = 3, reaction_time=0.7, sigma=0.45, lambda_att=4.3, kappa_def=1.72):
     '''
     Function contains all the parameters and their default 
     values so that we can use it for our pitch control 
@@ -28,6 +116,11 @@ def default_model_params(time_to_control = 3):
                        represented as 10^time_to_control.
                        If any player has less than 10^time_to_control value we will see it as
                        an outlier and will ignore that player.
+    reaction_time -- float, time taken by the player to react(in seconds).
+    sigma -- float, standard deviation of the sigmoid function in Spearman's model.
+    lambda_att -- float, ball control parameter for attacking team.
+    kappa_def -- float, advantage given to the defending players to control the ball.
+    The last four can be fitted to the data, see calibrate_model_params in utility_function_batch.
                        
     Returns:
     params: dict, parameters required to build the model.
@@ -43,21 +136,21 @@ def default_model_params(time_to_control = 3):
     params['max_player_speed'] = 5.0 
     ## maximum player speed = 5.0 m/s
     
-    params['reaction_time'] = 0.7
-    ## time take by the player to react and change trajectory = 0.7 second
+    params['reaction_time'] = reaction_time
+    ## time take by the player to react and change trajectory = 0.7 second(default)
     
-    params['sigma'] = 0.45
+    params['sigma'] = sigma
     ## standard deviation of sigmoid function in Spearman's model
     ## determines uncertainity in player's arrival time
     
-    params['kappa_def'] = 1.72
+    params['kappa_def'] = kappa_def
     ## kappa parameter defined in Spearman's model
     ## gives advantage to defending players to control the ball
     
-    params['lambda_att'] = 4.3
+    params['lambda_att'] = lambda_att
     ## ball control parameter for attacking team
     
-    params['lambda_def'] = 4.3 * params['kappa_def']
+    params['lambda_def'] = params['lambda_att'] * params['kappa_def']
     ## ball control parameter for defending team
     
     params['avg_ball_speed'] = 15
@@ -80,3 +173,768 @@ def default_model_params(time_to_control = 3):
     params['time_to_control_def'] = time_to_control * np.log(10) * (np.sqrt(3) * params['sigma'] / np.pi + 1/params['lambda_def'])
     
     return params
+   
+def initialize_players(team, team_name, params):
+    '''
+    Function to create a list of players that hold their position and velocities from tracking dataframe.
+    
+    Arguments:
+    team -- tracking_data for either home team or away team.
+    team_name -- either 'Home' or 'Away'.
+    params -- dict, dictionary of default parameters for our pitch control model.
+    
+    Returns:
+    team_players -- list having player positions and velocities.
+    '''
+    ## getting player ids(jersey numbers)
+    player_ids = np.unique([c.split('_')[1] for c in team.keys() if c.split('_')[0] == team_name and c[-2:] == '_X'])
+    
+    ## create empty list
+    team_players = []
+    
+    for pid in player_ids:
+        team_player = Player(pid, team, team_name, params)
+        if team_player.inframe:
+            team_players.append(team_player)
+    
+    return team_players
+    
+
+class TeamState:
+    '''
+    class holding the positions, velocities and model parameters of all the
+    players of a team as contiguous arrays, one row per player.
+    Used in place of a list of Player objects.
+    '''
+    
+    def __init__(self, player_ids, positions, velocities, params):
+        '''
+        Function to initialize TeamState class objects.
+        
+        Arguments:
+        self -- represents the object of the class.
+        player_ids -- list, player ids, e.g. 'Home_1'.
+        positions -- array of shape (n_players, 2), (x, y) of each player, NaN if not in frame.
+        velocities -- array of shape (n_players, 2), (vx, vy) of each player, NaN is taken as 0.
+        params -- dict, dictionary of default parameters for our pitch control model.
+        '''
+        self.player_ids = list(player_ids)
+        self.positions = np.ascontiguousarray(positions, dtype=np.float64)
+        self.velocities = np.nan_to_num(np.ascontiguousarray(velocities, dtype=np.float64))
+        self.inframe = ~np.isnan(self.positions).any(axis=1)
+        
+        ## per player parameters
+        n_players = len(self.player_ids)
+        self.v_max = np.full(n_players, float(params['max_player_speed']))
+        self.reaction_time = np.full(n_players, float(params['reaction_time']))
+    
+    def time_to_intercept(self, targets):
+        '''
+        Function to compute the time to intercept for every target and every player.
+        Players not in frame get an infinite time, so they never control the ball.
+        
+        Arguments:
+        self -- represents the object of the class.
+        targets -- array of shape (n_targets, 2), target locations.
+        
+        Returns:
+        tti -- array of shape (n_targets, n_players), time to intercept.
+        '''
+        tti = time_to_intercept(targets, self.positions, self.velocities, self.reaction_time, self.v_max)
+        tti[:, ~self.inframe] = np.inf
+        
+        return tti
+
+def team_arrays(tracking, team_name):
+    '''
+    Function to get the positions and velocities of all the players of a team
+    for every frame, straight from the tracking dataframe.
+    
+    Arguments:
+    tracking -- tracking dataframe with velocities, for either home team or away team.
+    team_name -- either 'Home' or 'Away'.
+    
+    Returns:
+    player_ids -- list, player ids, e.g. 'Home_1'.
+    positions -- array of shape (n_frames, n_players, 2), (x, y) of each player.
+    velocities -- array of shape (n_frames, n_players, 2), (vx, vy) of each player.
+    '''
+    ## getting player ids
+    player_ids = [c[:-2] for c in tracking.columns if c.split('_')[0] == team_name and c[-2:] == '_X']
+    
+    n_frames = len(tracking)
+    position_cols = [c for pid in player_ids for c in (pid + '_X', pid + '_Y')]
+    velocity_cols = [c for pid in player_ids for c in (pid + '_vx', pid + '_vy')]
+    
+    positions = tracking[position_cols].to_numpy(dtype=np.float64).reshape(n_frames, -1, 2)
+    velocities = tracking[velocity_cols].to_numpy(dtype=np.float64).reshape(n_frames, -1, 2)
+    
+    return player_ids, positions, velocities
+
+def initialize_team(team, team_name, params):
+    '''
+    Function to create the team state for one frame of the tracking dataframe.
+    
+    Arguments:
+    team -- one frame of tracking_data for either home team or away team.
+    team_name -- either 'Home' or 'Away'.
+    params -- dict, dictionary of default parameters for our pitch control model.
+    
+    Returns:
+    team_state -- TeamState object, positions and velocities of the players.
+    '''
+    ## getting player ids
+    player_ids = [c[:-2] for c in team.keys() if c.split('_')[0] == team_name and c[-2:] == '_X']
+    
+    ## one lookup for all the players, by position in the row
+    position_cols = [c for pid in player_ids for c in (pid + '_X', pid + '_Y')]
+    velocity_cols = [c for pid in player_ids for c in (pid + '_vx', pid + '_vy')]
+    
+    values = team.to_numpy(dtype=np.float64)
+    positions = values[team.index.get_indexer(position_cols)].reshape(-1, 2)
+    velocities = values[team.index.get_indexer(velocity_cols)].reshape(-1, 2)
+    
+    return TeamState(player_ids, positions, velocities, params)
+
+def time_to_intercept(targets, positions, velocities, reaction_time, v_max):
+    '''
+    Function to compute the time to intercept for every target and every player
+    at once. Same as Player.time_to_intercept_fun: the player keeps moving at the
+    current velocity for 'reaction_time' and then runs at full speed to the target.
+    
+    Arguments:
+    targets -- array of shape (n_targets, 2), target locations.
+    positions -- array of shape (n_players, 2), player positions,
+                 or (n_targets, n_players, 2) for different player positions for each target.
+    velocities -- array of same shape as positions, player velocities.
+    reaction_time -- float or array of shape (n_players,), reaction time of the players.
+    v_max -- float or array of shape (n_players,), maximum speed of the players.
+    
+    Returns:
+    tti -- array of shape (n_targets, n_players), time to intercept.
+    '''
+    reaction = positions + velocities * np.reshape(reaction_time, (-1, 1))
+    distance = np.hypot(targets[:, 0, np.newaxis] - reaction[..., 0], targets[:, 1, np.newaxis] - reaction[..., 1])
+    
+    return reaction_time + distance / v_max
+
+class InterceptCache:
+    '''
+    class holding a least recently used cache of time to intercept matrices.
+    
+    The time to intercept depends only on the players' positions and velocities
+    and on 'reaction_time' and 'max_player_speed', not on where the ball starts.
+    So for a frame the same matrix is used for every ball origin and for every
+    value of the other parameters. Use one cache per game.
+    '''
+    
+    def __init__(self, maxsize=256):
+        '''
+        Function to initialize InterceptCache class objects.
+        
+        Arguments:
+        self -- represents the object of the class.
+        maxsize -- int, maximum number of matrices kept in the cache.
+        '''
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def make_key(self, frame, team_name, targets, params):
+        '''
+        Function to make the cache key for a frame, team, grid and parameters.
+        
+        Arguments:
+        self -- represents the object of the class.
+        frame -- int, frame number.
+        team_name -- either 'Home' or 'Away'.
+        targets -- array of shape (n_targets, 2), target locations.
+        params -- dict, default parameters for our model.
+        
+        Returns:
+        key -- tuple, the cache key.
+        '''
+        grid_hash = hashlib.md5(np.ascontiguousarray(targets, dtype=np.float64).tobytes()).hexdigest()
+        params_hash = hash((float(params['reaction_time']), float(params['max_player_speed'])))
+        
+        return (int(frame), team_name, grid_hash, params_hash)
+    
+    def time_to_intercept(self, frame, team_name, targets, team, params):
+        '''
+        Function to get the time to intercept matrix for a team in a frame,
+        computing it only if it is not in the cache.
+        
+        Arguments:
+        self -- represents the object of the class.
+        frame -- int, frame number.
+        team_name -- either 'Home' or 'Away'.
+        targets -- array of shape (n_targets, 2), target locations.
+        team -- one frame of tracking_data for the team.
+        params -- dict, default parameters for our model.
+        
+        Returns:
+        tti -- array of shape (n_targets, n_players), time to intercept, read-only.
+        '''
+        key = self.make_key(frame, team_name, targets, params)
+        
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        
+        self.misses += 1
+        tti = initialize_team(team, team_name, params).time_to_intercept(targets)
+        tti.flags.writeable = False
+        
+        self.entries[key] = tti
+        if len(self.entries) > self.maxsize:
+            ## dropping the least recently used matrix
+            self.entries.popitem(last=False)
+        
+        return tti
+    
+    def clear(self):
+        '''
+        Function to empty the cache and reset the counters.
+        
+        Arguments:
+        self -- represents the object of the class.
+        '''
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+    
+    def __repr__(self):
+        return 'InterceptCache(size={}, maxsize={}, hits={}, misses={})'.format(len(self.entries), self.maxsize,
+                                                                              self.hits, self.misses)
+
+def calculate_pitch_control(targets, ball_start_pos, tti_att, tti_def, params, return_steps=False):
+    '''
+    Function to compute pitch control at many target locations at once.
+    
+    Arguments:
+    targets -- array of shape (n_targets, 2), target locations.
+    ball_start_pos -- array, (x, y) position of the ball, NaN if not known,
+                      or of shape (n_targets, 2) for a different ball position for each target.
+    tti_att -- array of shape (n_targets, n_attackers), time to intercept for the attacking players.
+    tti_def -- array of shape (n_targets, n_defenders), time to intercept for the defending players.
+    params -- dict, default parameters for our model.
+    return_steps -- bool, True for also returning the number of time steps of each target.
+    
+    Returns:
+    PPCF_att -- array of shape (n_targets,), pitch control of the attacking team.
+    PPCF_def -- array of shape (n_targets,), pitch control of the defending team.
+    n_steps -- array of shape (n_targets,), number of integration time steps, zero where
+               a team has a sufficient head start, only if return_steps is True.
+    '''
+    n_targets = len(targets)
+    
+    ## time taken by the ball to reach each target, zero when the ball position is not known
+    ball_travel_time = np.linalg.norm(targets - ball_start_pos, axis=1) / params['avg_ball_speed']
+    ball_travel_time[np.isnan(ball_travel_time)] = 0.0
+    
+    ## first player of each team to reach each target
+    tau_min_att = tti_att.min(axis=1)
+    tau_min_def = tti_def.min(axis=1)
+    
+    PPCF_att = np.zeros(n_targets)
+    PPCF_def = np.zeros(n_targets)
+    n_steps = np.zeros(n_targets, dtype=np.int64)
+    
+    ## a team with a sufficient head start controls the target, no need to integrate
+    def_wins = tau_min_att - np.maximum(ball_travel_time, tau_min_def) >= params['time_to_control_def']
+    att_wins = ~def_wins & (tau_min_def - np.maximum(ball_travel_time, tau_min_att) >= params['time_to_control_att'])
+    PPCF_def[def_wins] = 1.0
+    PPCF_att[att_wins] = 1.0
+    
+    ## integrating for the other targets
+    todo = ~(def_wins | att_wins)
+    if todo.any():
+        PPCF_att[todo], PPCF_def[todo], n_steps[todo] = integrate_pitch_control(ball_travel_time[todo], tti_att[todo],
+                                                                                tti_def[todo], params, return_steps=True)
+    
+    if return_steps:
+        return PPCF_att, PPCF_def, n_steps
+    
+    return PPCF_att, PPCF_def
+
+def integrate_pitch_control(ball_travel_time, tti_att, tti_def, params, return_steps=False):
+    '''
+    Function to integrate the ball control probability of every player over
+    time, for all the targets at once. A target stops changing once its total
+    probability is within 'model_converge_tol' of one.
+    
+    Only the targets still being integrated are kept in the working arrays,
+    the others are written out and dropped as soon as they are done, so later
+    time steps only work on the slow targets.
+    
+    Arguments:
+    ball_travel_time -- array of shape (n_targets,), time taken by the ball to reach each target.
+    tti_att -- array of shape (n_targets, n_attackers), time to intercept for the attacking players.
+    tti_def -- array of shape (n_targets, n_defenders), time to intercept for the defending players.
+    params -- dict, default parameters for our model.
+    return_steps -- bool, True for also returning the number of time steps of each target.
+    
+    Returns:
+    PPCF_att -- array of shape (n_targets,), pitch control of the attacking team.
+    PPCF_def -- array of shape (n_targets,), pitch control of the defending team.
+    n_steps -- array of shape (n_targets,), number of time steps, only if return_steps is True.
+    '''
+    int_dt = params['int_dt']
+    sigmoid_scale = np.pi / np.sqrt(3.0) / params['sigma']
+    
+    PPCF_att = np.zeros(len(ball_travel_time))
+    PPCF_def = np.zeros(len(ball_travel_time))
+    steps = np.zeros(len(ball_travel_time), dtype=np.int64)
+    
+    ## number of time steps for each target, same as the length of
+    ## np.arange(ball_travel_time - int_dt, ball_travel_time + max_int_time, int_dt)
+    max_steps = np.ceil(((ball_travel_time + params['max_int_time']) - (ball_travel_time - int_dt)) / int_dt)
+    
+    ## working arrays, only for the targets still being integrated
+    index = np.nonzero(max_steps > 1)[0]
+    btt = ball_travel_time[index, np.newaxis]
+    max_steps = max_steps[index]
+    tti_att = tti_att[index]
+    tti_def = tti_def[index]
+    
+    ## only the players that can arrive in time take part
+    in_att = (tti_att - tti_att.min(axis=1, keepdims=True)) < params['time_to_control_att']
+    in_def = (tti_def - tti_def.min(axis=1, keepdims=True)) < params['time_to_control_def']
+    
+    ## pitch control of every player and total for each team
+    player_att = np.zeros(tti_att.shape)
+    player_def = np.zeros(tti_def.shape)
+    total_att = np.zeros(len(index))
+    total_def = np.zeros(len(index))
+    
+    i = 1
+    while len(index) > 0:
+        T = btt + (i - 1) * int_dt
+        remaining = (1 - total_att - total_def)[:, np.newaxis]
+        
+        ## probability of each player intercepting the ball by time T
+        prob_att = in_att / (1 + np.exp(-sigmoid_scale * (T - tti_att)))
+        prob_def = in_def / (1 + np.exp(-sigmoid_scale * (T - tti_def)))
+        
+        player_att += remaining * prob_att * params['lambda_att'] * int_dt
+        player_def += remaining * prob_def * params['lambda_def'] * int_dt
+        
+        total_att = player_att.sum(axis=1)
+        total_def = player_def.sum(axis=1)
+        
+        ## targets that have converged or reached max_int_time
+        done = ((1 - total_att - total_def) <= params['model_converge_tol']) | (i + 1 >= max_steps)
+        
+        if done.any():
+            PPCF_att[index[done]] = total_att[done]
+            PPCF_def[index[done]] = total_def[done]
+            steps[index[done]] = i
+            
+            ## dropping them from the working arrays
+            keep = ~done
+            index, btt, max_steps = index[keep], btt[keep], max_steps[keep]
+            tti_att, tti_def, in_att, in_def = tti_att[keep], tti_def[keep], in_att[keep], in_def[keep]
+            player_att, player_def = player_att[keep], player_def[keep]
+            total_att, total_def = total_att[keep], total_def[keep]
+        
+        i += 1
+    
+    if return_steps:
+        return PPCF_att, PPCF_def, steps
+    
+    return PPCF_att, PPCF_def
+
+def pitch_control_at_targets(event_id, event_data, tracking_home, tracking_away, params, targets, tti_cache=None,
+                             return_steps=False):
+    '''
+    Function for computing pitch control at any list of target locations for
+    a given event, e.g. the end location of a pass. Targets where one team has
+    a sufficient head start are not integrated.
+    
+    Arguments:
+    event_id -- int, index of the event in event's dataframe.
+    event_data -- event dataframe.
+    tracking_home -- tracking data for home team.
+    tracking_away -- tracking data for away team.
+    params -- dict, default parameters for our model.
+    targets -- array of shape (n_targets, 2), target locations.
+    tti_cache -- InterceptCache object, for reusing the time to intercept of a frame, None for no cache.
+    return_steps -- bool, True for also returning the number of time steps of each target.
+    
+    Returns:
+    PPCF_att -- array of shape (n_targets,), pitch control of the attacking team.
+    PPCF_def -- array of shape (n_targets,), pitch control of the defending team.
+    n_steps -- array of shape (n_targets,), number of integration time steps, only if return_steps is True.
+    '''
+    targets = np.atleast_2d(np.asarray(targets, dtype=np.float64))
+    
+    ## getting the starting frame, team in possession, ball's starting position
+    pass_frame = event_data.loc[event_id, 'Start Frame']
+    pass_team = event_data.loc[event_id, 'Team']
+    ball_start_pos = np.array([event_data.loc[event_id, 'Start X'], event_data.loc[event_id, 'Start Y']])
+    
+    ## tracking data of the attacking and the defending team in the pass frame
+    if pass_team == 'Home':
+        teams = [('Home', tracking_home.loc[pass_frame]), ('Away', tracking_away.loc[pass_frame])]
+    elif pass_team == 'Away':
+        teams = [('Away', tracking_away.loc[pass_frame]), ('Home', tracking_home.loc[pass_frame])]
+    else:
+        assert False, "Team in possession must be either home or away"
+    
+    ## time to intercept for every target and every player
+    if tti_cache is None:
+        tti_att, tti_def = [initialize_team(team, team_name, params).time_to_intercept(targets)
+                            for team_name, team in teams]
+    else:
+        tti_att, tti_def = [tti_cache.time_to_intercept(pass_frame, team_name, targets, team, params)
+                            for team_name, team in teams]
+    
+    return calculate_pitch_control(targets, ball_start_pos, tti_att, tti_def, params, return_steps)
+
+def generate_pitch_control_for_events(event_id, event_data, tracking_home, tracking_away, params, n_grid_cell_x=50,
+                                      tti_cache=None, return_steps=False):
+    '''
+    Function for generating the pitch control surface for any given event.
+    
+    Arguments:
+    event_id -- int, index of the event in event's dataframe.
+    event_data -- event dataframe.
+    tracking_home -- tracking data for home team.
+    tracking_away -- tracking data for away team.
+    params -- dict, default parameters for our model.
+    n_grid_cell_x -- int, number of pixels in the grid(in x-direction).
+    tti_cache -- InterceptCache object, for reusing the time to intercept of a frame, None for no cache.
+    return_steps -- bool, True for also returning the average number of time steps.
+    
+    Returns:
+    PPCF_a -- array of shape (len(y_grid), len(x_grid)), pitch control of the attacking team.
+    PPCF_d -- array of shape (len(y_grid), len(x_grid)), pitch control of the defending team.
+    x_grid -- array, x position of the grid cells.
+    y_grid -- array, y position of the grid cells.
+    mean_steps -- float, average number of integration time steps per cell, only if return_steps is True.
+    '''
+    field_dims = (105, 68)
+    ## field dimension for our pitch map
+    
+    ## breaking the pitch down into grids
+    ## n_grid_cell_y will be calculated based on n_grid_cell_x and field dimensions
+    n_grid_cell_y = int(n_grid_cell_x * field_dims[1] / field_dims[0])
+    x_grid = np.linspace(-field_dims[0] / 2, field_dims[0] / 2, n_grid_cell_x)
+    y_grid = np.linspace(-field_dims[1] / 2, field_dims[1] / 2, n_grid_cell_y)
+    
+    ## every grid cell as a target, row by row
+    x_mesh, y_mesh = np.meshgrid(x_grid, y_grid)
+    targets = np.column_stack([x_mesh.ravel(), y_mesh.ravel()])
+    
+    ## calculating pitch control for all the cells at once
+    PPCF_a, PPCF_d, n_steps = pitch_control_at_targets(event_id, event_data, tracking_home, tracking_away, params,
+                                                       targets, tti_cache, return_steps=True)
+    PPCF_a = PPCF_a.reshape(len(y_grid), len(x_grid))
+    PPCF_d = PPCF_d.reshape(len(y_grid), len(x_grid))
+    
+    if return_steps:
+        return PPCF_a, PPCF_d, x_grid, y_grid, n_steps.mean()
+    
+    return PPCF_a, PPCF_d, x_grid, y_grid
+
+def pitch_control_for_frames(tracking_home, tracking_away, attacking_team, params, frames=None,
+                             n_grid_cell_x=50, batch_size=50):
+    '''
+    Function for generating the pitch control surface for every frame of a
+    frame range, with the ball starting where it is in that frame.
+    Frames are done in batches, all the cells of all the frames of a batch
+    are integrated at once.
+    
+    Arguments:
+    tracking_home -- tracking data with velocities for home team.
+    tracking_away -- tracking data with velocities for away team.
+    attacking_team -- either 'Home' or 'Away', the team in possession.
+    params -- dict, default parameters for our model.
+    frames -- list, frame numbers, None for all the frames.
+    n_grid_cell_x -- int, number of pixels in the grid(in x-direction).
+    batch_size -- int, number of frames done at a time.
+    
+    Returns:
+    surfaces -- array of shape (len(frames), len(y_grid), len(x_grid)), pitch control of the attacking team.
+    x_grid -- array, x position of the grid cells.
+    y_grid -- array, y position of the grid cells.
+    '''
+    if attacking_team not in ['Home', 'Away']:
+        assert False, "Team in possession must be either home or away"
+    defending_team = 'Away' if attacking_team == 'Home' else 'Home'
+    
+    if frames is None:
+        frames = tracking_home.index.values
+    
+    ## breaking the pitch down into grids
+    field_dims = (105, 68)
+    n_grid_cell_y = int(n_grid_cell_x * field_dims[1] / field_dims[0])
+    x_grid = np.linspace(-field_dims[0] / 2, field_dims[0] / 2, n_grid_cell_x)
+    y_grid = np.linspace(-field_dims[1] / 2, field_dims[1] / 2, n_grid_cell_y)
+    
+    x_mesh, y_mesh = np.meshgrid(x_grid, y_grid)
+    grid = np.column_stack([x_mesh.ravel(), y_mesh.ravel()])
+    n_cells = len(grid)
+    
+    ## positions and velocities of both the teams and the ball for the frames
+    tracking = {'Home': tracking_home, 'Away': tracking_away}
+    team_data = {}
+    for team_name in [attacking_team, defending_team]:
+        _, positions, velocities = team_arrays(tracking[team_name], team_name)
+        rows = tracking[team_name].index.get_indexer(frames)
+        if np.any(rows < 0):
+            assert False, "Frames must be in the tracking data"
+        team_data[team_name] = (positions[rows], np.nan_to_num(velocities[rows]))
+    
+    rows = tracking_home.index.get_indexer(frames)
+    ball = tracking_home[['ball_X', 'ball_Y']].to_numpy(dtype=np.float64)[rows]
+    
+    surfaces = np.empty((len(frames), n_grid_cell_y, n_grid_cell_x))
+    
+    for start in range(0, len(frames), batch_size):
+        batch = slice(start, start + batch_size)
+        n_frames = len(ball[batch])
+        
+        ## every cell of every frame of the batch as a target
+        targets = np.tile(grid, (n_frames, 1))
+        ball_start_pos = np.repeat(ball[batch], n_cells, axis=0)
+        
+        tti = []
+        for team_name in [attacking_team, defending_team]:
+            positions, velocities = team_data[team_name]
+            positions = np.repeat(positions[batch], n_cells, axis=0)
+            velocities = np.repeat(velocities[batch], n_cells, axis=0)
+            
+            team_tti = time_to_intercept(targets, positions, velocities, params['reaction_time'],
+                                         params['max_player_speed'])
+            team_tti[np.isnan(positions).any(axis=2)] = np.inf
+            tti.append(team_tti)
+        
+        PPCF_att, _ = calculate_pitch_control(targets, ball_start_pos, tti[0], tti[1], params)
+        surfaces[batch] = PPCF_att.reshape(n_frames, n_grid_cell_y, n_grid_cell_x)
+    
+    return surfaces, x_grid, y_grid
+
+def resample_surface(surface, x_grid, y_grid, n_grid_cell_x):
+    '''
+    Function to resample a pitch control surface to another resolution
+    by bilinear interpolation.
+    
+    Arguments:
+    surface -- array of shape (len(y_grid), len(x_grid)), pitch control surface.
+    x_grid -- array, x position of the grid cells, evenly spaced.
+    y_grid -- array, y position of the grid cells, evenly spaced.
+    n_grid_cell_x -- int, number of pixels in the new grid(in x-direction).
+    
+    Returns:
+    new_surface -- array of shape (len(new_y_grid), len(new_x_grid)), resampled surface.
+    new_x_grid -- array, x position of the new grid cells.
+    new_y_grid -- array, y position of the new grid cells.
+    '''
+    ## n_grid_cell_y keeps the aspect ratio of the old grid
+    n_grid_cell_y = int(n_grid_cell_x * (y_grid[-1] - y_grid[0]) / (x_grid[-1] - x_grid[0]))
+    new_x_grid = np.linspace(x_grid[0], x_grid[-1], n_grid_cell_x)
+    new_y_grid = np.linspace(y_grid[0], y_grid[-1], n_grid_cell_y)
+    
+    ## fractional index of each new cell in the old grid
+    fx = (new_x_grid - x_grid[0]) / (x_grid[1] - x_grid[0])
+    fy = (new_y_grid - y_grid[0]) / (y_grid[1] - y_grid[0])
+    ix = np.clip(np.floor(fx).astype(int), 0, len(x_grid) - 2)
+    iy = np.clip(np.floor(fy).astype(int), 0, len(y_grid) - 2)
+    wx = (fx - ix)[np.newaxis, :]
+    wy = (fy - iy)[:, np.newaxis]
+    
+    ## interpolating along x on the two rows around each new row, then along y
+    top = surface[iy][:, ix] * (1 - wx) + surface[iy][:, ix + 1] * wx
+    bottom = surface[iy + 1][:, ix] * (1 - wx) + surface[iy + 1][:, ix + 1] * wx
+    new_surface = top * (1 - wy) + bottom * wy
+    
+    return new_surface, new_x_grid, new_y_grid
+
+def generate_adaptive_pitch_control_for_events(event_id, event_data, tracking_home, tracking_away, params,
+                                               n_grid_cell_x=26, n_levels=3, refine_tol=0.05, refine_band=0.1):
+    '''
+    Function for generating a high resolution pitch control surface for any given event
+    by refining a coarse grid only where it is needed.
+    
+    Pitch control is first computed on a coarse grid. At each level the grid is made
+    twice as fine, the new cells are filled by interpolation and pitch control is
+    only computed for the cells around coarse cells where it changes by more than
+    'refine_tol', or is within 'refine_band' of 0.5. Only those cells are refined
+    again at the next level.
+    
+    Arguments:
+    event_id -- int, index of the event in event's dataframe.
+    event_data -- event dataframe.
+    tracking_home -- tracking data for home team.
+    tracking_away -- tracking data for away team.
+    params -- dict, default parameters for our model.
+    n_grid_cell_x -- int, number of pixels in the coarse grid(in x-direction).
+    n_levels -- int, number of times the grid is refined.
+    refine_tol -- float, cells where pitch control changes by more than this are refined.
+    refine_band -- float, cells where pitch control is within this of 0.5 are refined.
+    
+    Returns:
+    PPCF_a -- array of shape (len(y_grid), len(x_grid)), pitch control of the attacking team.
+    PPCF_d -- array of shape (len(y_grid), len(x_grid)), pitch control of the defending team.
+    x_grid -- array, x position of the grid cells, (n_grid_cell_x - 1) * 2**n_levels + 1 of them.
+    y_grid -- array, y position of the grid cells.
+    '''
+    field_dims = (105, 68)
+    
+    ## pitch control on the coarse grid
+    PPCF_a, PPCF_d, x_grid, y_grid = generate_pitch_control_for_events(event_id, event_data, tracking_home,
+                                                                       tracking_away, params, n_grid_cell_x)
+    
+    ## every coarse cell is a candidate for refining
+    candidates = np.ones((len(y_grid) - 1, len(x_grid) - 1), dtype=bool)
+    
+    for _ in range(n_levels):
+        ## cells to be refined, from the pitch control at their four corners
+        corners = np.stack([PPCF_a[:-1, :-1], PPCF_a[:-1, 1:], PPCF_a[1:, :-1], PPCF_a[1:, 1:]])
+        refine = candidates & ((corners.max(axis=0) - corners.min(axis=0) > refine_tol) |
+                               (np.abs(corners - 0.5) < refine_band).any(axis=0))
+        
+        ## twice as fine grid, old cells are every other cell
+        ny, nx = 2 * len(y_grid) - 1, 2 * len(x_grid) - 1
+        x_grid = np.linspace(-field_dims[0] / 2, field_dims[0] / 2, nx)
+        y_grid = np.linspace(-field_dims[1] / 2, field_dims[1] / 2, ny)
+        
+        ## filling the new cells by interpolation
+        new_surfaces = []
+        for surface in [PPCF_a, PPCF_d]:
+            new_surface = np.empty((ny, nx))
+            new_surface[::2, ::2] = surface
+            new_surface[1::2, ::2] = (surface[:-1] + surface[1:]) / 2
+            new_surface[::2, 1::2] = (surface[:, :-1] + surface[:, 1:]) / 2
+            new_surface[1::2, 1::2] = (surface[:-1, :-1] + surface[:-1, 1:] + surface[1:, :-1] + surface[1:, 1:]) / 4
+            new_surfaces.append(new_surface)
+        PPCF_a, PPCF_d = new_surfaces
+        
+        ## new cells inside or on the edge of the refined cells
+        compute = np.zeros((ny, nx), dtype=bool)
+        rows, cols = np.nonzero(refine)
+        for di, dj in [(1, 0), (1, 2), (0, 1), (2, 1), (1, 1)]:
+            compute[2 * rows + di, 2 * cols + dj] = True
+        
+        if compute.any():
+            ## computing pitch control only for those cells
+            rows, cols = np.nonzero(compute)
+            targets = np.column_stack([x_grid[cols], y_grid[rows]])
+            PPCF_a[rows, cols], PPCF_d[rows, cols] = pitch_control_at_targets(event_id, event_data, tracking_home,
+                                                                              tracking_away, params, targets)
+        
+        ## only the four children of a refined cell can be refined again
+        candidates = np.repeat(np.repeat(refine, 2, axis=0), 2, axis=1)
+    
+    return PPCF_a, PPCF_d, x_grid, y_grid
+
+def pass_player_states(passes, tracking_home, tracking_away):
+    '''
+    Function for getting the player positions and velocities at the start
+    of many passes, as needed by pass_probability_from_states.
+    
+    The player positions and velocities are taken once for each frame,
+    passes made in the same frame share them. None of it depends on the
+    model parameters, so the same states can be used for any parameters.
+    
+    Arguments:
+    passes -- event dataframe, having the passes.
+    tracking_home -- tracking data with velocities for home team.
+    tracking_away -- tracking data with velocities for away team.
+    
+    Returns:
+    states -- list, one dict for each team in possession, having 'mask' (its passes),
+              'start_pos', 'targets' and 'positions', 'velocities', 'inframe'
+              for the attacking and the defending players.
+    '''
+    states = []
+    
+    ## positions and velocities of both the teams for every frame
+    tracking = {'Home': tracking_home, 'Away': tracking_away}
+    arrays = {team_name: team_arrays(tracking[team_name], team_name) for team_name in ['Home', 'Away']}
+    
+    for team_name, opp_name in [('Home', 'Away'), ('Away', 'Home')]:
+        ## passes made by this team
+        mask = (passes['Team'] == team_name).values
+        if not mask.any():
+            continue
+        
+        state = {'mask': mask}
+        state['start_pos'] = passes.loc[mask, ['Start X', 'Start Y']].to_numpy(dtype=np.float64)
+        state['targets'] = passes.loc[mask, ['End X', 'End Y']].to_numpy(dtype=np.float64)
+        
+        ## unique frames, each pass points to its frame
+        frames, inverse = np.unique(passes.loc[mask, 'Start Frame'].values, return_inverse=True)
+        
+        for side, name in [('att', team_name), ('def', opp_name)]:
+            _, positions, velocities = arrays[name]
+            rows = tracking[name].index.get_indexer(frames)
+            if np.any(rows < 0):
+                assert False, "Start Frame of a pass is not in the tracking data"
+            
+            ## players of each unique frame only, NaN velocity is taken as 0
+            positions = positions[rows]
+            velocities = np.nan_to_num(velocities[rows])
+            
+            state['positions_' + side] = positions[inverse]
+            state['velocities_' + side] = velocities[inverse]
+            state['inframe_' + side] = ~np.isnan(positions[inverse]).any(axis=2)
+        
+        states.append(state)
+    
+    return states
+
+def pass_probability_from_states(states, n_passes, params):
+    '''
+    Function for computing pitch control at the end location of the passes
+    from the states made by pass_player_states.
+    
+    Arguments:
+    states -- list, returned by pass_player_states.
+    n_passes -- int, number of passes the states were made from.
+    params -- dict, default parameters for our model.
+    
+    Returns:
+    PPCF_att -- array of shape (n_passes,), pitch control of the attacking team at the end location.
+    PPCF_def -- array of shape (n_passes,), pitch control of the defending team at the end location.
+    '''
+    PPCF_att = np.full(n_passes, np.nan)
+    PPCF_def = np.full(n_passes, np.nan)
+    
+    for state in states:
+        tti = []
+        for side in ['att', 'def']:
+            ## time to intercept from the players of the pass frame to the pass end location
+            team_tti = time_to_intercept(state['targets'], state['positions_' + side], state['velocities_' + side],
+                                         params['reaction_time'], params['max_player_speed'])
+            team_tti[~state['inframe_' + side]] = np.inf
+            tti.append(team_tti)
+        
+        mask = state['mask']
+        PPCF_att[mask], PPCF_def[mask] = calculate_pitch_control(state['targets'], state['start_pos'],
+                                                                 tti[0], tti[1], params)
+    
+    return PPCF_att, PPCF_def
+
+def pass_success_probability(passes, tracking_home, tracking_away, params):
+    '''
+    Function for computing pitch control of the attacking team at the end
+    location of many passes at once, i.e. the probability of each pass
+    being successful.
+    
+    Arguments:
+    passes -- event dataframe, having the passes.
+    tracking_home -- tracking data with velocities for home team.
+    tracking_away -- tracking data with velocities for away team.
+    params -- dict, default parameters for our model.
+    
+    Returns:
+    PPCF_att -- array of shape (len(passes),), pitch control of the attacking team at the end location.
+    PPCF_def -- array of shape (len(passes),), pitch control of the defending team at the end location.
+    '''
+    states = pass_player_states(passes, tracking_home, tracking_away)
+    
+    return pass_probability_from_states(states, len(passes), params)
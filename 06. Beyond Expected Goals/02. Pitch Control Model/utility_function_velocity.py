@@ -1,239 +1,548 @@
 # -*- coding: utf-8 -*-
 """
-Created on Sat May  9 22:00:35 2020
+Created on Tue Apr 28 19:49:26 2020
 
 @author: slothfulwave612
+Python module for making functions to compute velocity.
 
-This Python module will contain all the required
-function for making a pitch control model.
-
-This code was contributed on Friend of Tracking by Laurie Shaw
-and the pitch control model concepts are from William Spearman's
-research paper 'Beyond Expected Goals'
-
-I have made notes on same on my GitHub Repository, more further explanation 
-of the model you can check it out.
+Modules Used(2):
+1. numpy -- numerical computing library.
+2. pandas -- Python library for data manipulation and analysis.
 """
 
 import numpy as np
+import pandas as pd
 
+def remove_velocity(df):
+    '''
+    Function to remove velocity columns(if present) from the dataframe.
+    The dataframe passed in is not changed.
+    
+    Argument:
+    df -- dataframe object, tracking dataframe.
+    
+    Returns:
+    df -- dataframe object, tracking dataframe without the velocity columns.
+    '''
+    cols_del = ['vx', 'vy', 'speed']
+    
+    columns = [cols for cols in df.columns if cols.split('_')[-1] in cols_del]
+    
+    return df.drop(columns=columns)
 
-class Player:
+def moving_average(values, window):
     '''
-    class defining a player object that stores position, velocity, time-to-intercept and pitch control
-    contribution for a player.
+    Function to smooth every column of an array with a moving average
+    along the time axis, i.e. a NaN makes the whole window NaN.
+    
+    Each column is smoothed with np.convolve, which does the whole window
+    in one pass over a column that fits in the cache, so the array should
+    be in Fortran order(columns contiguous) as the dataframe values are.
+    
+    Argument:
+    values -- array of shape (n_frames, n_columns).
+    window -- int, smoothing window size in number of frames.
+    
+    Returns:
+    smooth -- array of shape (n_frames, n_columns), in the same order as values.
     '''
+    ma_window = np.ones(window) / window
+    smooth = np.empty_like(values)
     
-    def __init__(self, pid, team, team_name, params):
-        '''
-        Function to initialize Player class objects.
-        
-        Arguments:
-        self -- represents the object of the class.
-        pid -- player id.
-        team -- tracking frame.
-        team_name -- 'Home' or 'Away'.
-        params -- dictionary containing default parameters for pitch control model.
-        '''
-        self.id = pid
-        self.team_name = team_name
-        self.player_name = '{0}_{1}'.format(team_name, pid)
-        self.v_max = params['max_player_speed']  ## maximum player speed in m/s
-        self.reaction_time = params['reaction_time']
-        self.sigma = params['sigma']
-        self.get_position(team)
-        self.get_velocity(team)
-        self.PPCF = 0
-    
-    def get_position(self, team):
-        '''
-        Function to get the postion of the player.
-        If the position is NaN inframe will be set to False
-        
-        Arguments:
-        self -- represents the object of the class.
-        team -- tracking frame
-        '''
-        self.position = np.array([team[self.player_name + 'x'], team[self.player_name + 'y']])
-        self.inframe = not np.any(np.isnan(self.position))
+    for col in range(values.shape[1]):
+        smooth[:, col] = np.convolve(values[:, col], ma_window, mode='same')
     
-    def get_velocity(self, team):
-        '''
-        Function to get the velocity of the player.
-        If the velocity of the player is zero than set the velocity array to 0, 0 for x and y respectively.
-        
-        Arguments:
-        self -- represents the object of the class.
-        team -- tracking frame.
-        '''
-        self.velocity = np.array([team[self.player_name + 'vx'], team[self.player_name + 'vy']])
-        if np.any(np.isnan(self.velocity)):
-            self.velocity = np.array([0.0, 0.0])
-        
-    def time_to_intercept_fun(self, final_pos):
-        '''
-        Function that computes time to intercept value.
-        
-        Arguments:
-        self -- represents the object of the class.
-        final_pos -- time taken by the player to reach the final_position.
-        
-        ReturnsL
-        time_to_intercept -- time taken to intercept the ball.
-        '''
-        self.PPCF = 0.0
-        ## Time to intercept assumes that the player continues moving at current velocity for 'reaction_time'
-        ## and then runs at full speed to the target position.
-        
-        reaction = self.position + self.velocity * self.reaction_time
-        self.time_to_intercept = self.reaction_time + np.linalg.norm(final_pos - reaction) / self.v_max
-        
-        return self.time_to_intercept
+    return smooth
+
+def window_sums(values, window, order, segments=None):
+    '''
+    Function to compute, for every frame, sums over the window around it
+    that are needed for a local polynomial fit. Frames having NaN values or
+    being in another segment(e.g. period) are left out of the sums.
     
-    def probability_intercept_ball(self, arr_time):
-        '''
-        Function to compute the probability of a player to intercept the ball.
-        
-        Arguments:
-        self -- represents the object of the class.
-        arr_time -- time taken by the player to arrive at the target location of the ball.
-        '''
-        probab = 1 / (1 + np.exp(-np.pi / np.sqrt(3.0) / self.sigma * (arr_time - self.time_to_intercept)))
-        
-        return probab
+    The window covers the frames from -(window // 2) to window - 1 - window // 2
+    around each frame, the same frames as moving_average uses.
+    
+    Argument:
+    values -- array of shape (n_frames, n_columns).
+    window -- int, smoothing window size in number of frames.
+    order -- int, order of the polynomial.
+    segments -- array of shape (n_frames,), windows do not go across a change
+                in this value, None for no segments.
+    
+    Returns:
+    weight_sums -- array of shape (2 * order + 1, n_frames, n_columns),
+                   sum of t^k over the frames used, t being the offset in frames.
+    value_sums -- array of shape (order + 1, n_frames, n_columns),
+                  sum of t^k * value over the frames used.
+    '''
+    n_frames = len(values)
+    front = window // 2
+    pad = [(front, window - 1 - front), (0, 0)]
+    
+    valid = np.pad(~np.isnan(values), pad)
+    filled = np.pad(np.where(np.isnan(values), 0.0, values), pad)
+    if segments is not None:
+        segment_pad = np.pad(segments, pad[0], mode='edge')
+    
+    weight_sums = np.zeros((2 * order + 1,) + values.shape)
+    value_sums = np.zeros((order + 1,) + values.shape)
+    
+    for shift in range(window):
+        t = shift - front
+        used = valid[shift:shift + n_frames]
+        if segments is not None:
+            used = used & (segment_pad[shift:shift + n_frames] == segments)[:, np.newaxis]
+        used_values = np.where(used, filled[shift:shift + n_frames], 0.0)
         
+        for k in range(2 * order + 1):
+            weight_sums[k] += used * float(t)**k
+        for k in range(order + 1):
+            value_sums[k] += used_values * float(t)**k
+    
+    return weight_sums, value_sums
 
-def default_model_params(time_to_control = 3):
+def nan_moving_average(values, window, segments=None):
     '''
-    Function contains all the parameters and their default 
-    values so that we can use it for our pitch control 
-    model building.
+    Function to smooth every column with a moving average that leaves out
+    NaN values and divides by the number of values used, so a NaN does not
+    spread over the window. Windows do not go across segments.
     
     Argument:
-    time_to_control -- int, it is the minimum time a used by the player to control the ball
-                       represented as 10^time_to_control.
-                       If any player has less than 10^time_to_control value we will see it as
-                       an outlier and will ignore that player.
-                       
+    values -- array of shape (n_frames, n_columns).
+    window -- int, smoothing window size in number of frames.
+    segments -- array of shape (n_frames,), e.g. period of each frame, None for no segments.
+    
     Returns:
-    params: dict, parameters required to build the model.
+    smooth -- array of shape (n_frames, n_columns), NaN where the window has no values.
     '''
-    params = {}
-    ## dictionary will contain all the required parameters
+    weight_sums, value_sums = window_sums(values, window, 0, segments)
     
-    ## model parameters
+    with np.errstate(invalid='ignore', divide='ignore'):
+        smooth = value_sums[0] / weight_sums[0]
     
-    params['max_player_acc'] = 7.0 
-    ## maximum player acceleration = 7.0 m/s^2
+    return smooth
+
+def savgol_smooth(values, window, polyorder=1, segments=None):
+    '''
+    Function to smooth every column with a Savitzky-Golay filter, i.e. a
+    least squares polynomial fitted over the window around each frame.
+    NaN values are left out of the fit and windows do not go across
+    segments, so frames near a gap or a period change use a shorter,
+    one sided fit.
+    
+    Argument:
+    values -- array of shape (n_frames, n_columns).
+    window -- int, smoothing window size in number of frames.
+    polyorder -- int, order of the polynomial, less than window.
+    segments -- array of shape (n_frames,), e.g. period of each frame, None for no segments.
     
-    params['max_player_speed'] = 5.0 
-    ## maximum player speed = 5.0 m/s
+    Returns:
+    smooth -- array of shape (n_frames, n_columns), NaN where the window has
+              fewer than polyorder + 1 values.
+    '''
+    assert polyorder < window, "polyorder must be less than window"
     
-    params['reaction_time'] = 0.7
-    ## time take by the player to react and change trajectory = 0.7 second
+    weight_sums, value_sums = window_sums(values, window, polyorder, segments)
     
-    params['sigma'] = 0.45
-    ## standard deviation of sigmoid function in Spearman's model
-    ## determines uncertainity in player's arrival time
+    ## enough values for a fit
+    fit = weight_sums[0] >= polyorder + 1
     
-    params['kappa_def'] = 1.72
-    ## kappa parameter defined in Spearman's model
-    ## gives advantage to defending players to control the ball
+    if polyorder <= 1:
+        ## straight line, constant term of the fit written out
+        s0, s1, s2 = weight_sums if polyorder == 1 else (weight_sums[0], 0.0, 1.0)
+        b0, b1 = value_sums if polyorder == 1 else (value_sums[0], 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            smooth = (s2 * b0 - s1 * b1) / (s0 * s2 - s1**2)
+        smooth[~fit] = np.nan
+        return smooth
     
-    params['lambda_att'] = 4.3
-    ## ball control parameter for attacking team
+    ## normal equations for each frame and column
+    powers = np.add.outer(np.arange(polyorder + 1), np.arange(polyorder + 1))
+    lhs = np.moveaxis(weight_sums[powers], [0, 1], [-2, -1])
+    rhs = np.moveaxis(value_sums, 0, -1)
     
-    params['lambda_def'] = 4.3 * params['kappa_def']
-    ## ball control parameter for defending team
+    ## frames without enough values are solved with identity and set to NaN
+    lhs[~fit] = np.eye(polyorder + 1)
+    rhs[~fit] = 0.0
     
-    params['avg_ball_speed'] = 15
-    ## average ball speed = 15 m/s
+    ## value of the polynomial at the frame itself is the constant term
+    smooth = np.linalg.solve(lhs, rhs[..., np.newaxis])[..., 0, 0]
+    smooth[~fit] = np.nan
     
-    params['int_dt'] = 0.04
-    ## integration timestep(dt)
+    return smooth
+
+def smooth_values(values, period, window, filter_type='moving_average', polyorder=1):
+    '''
+    Function to smooth frame by frame differences(e.g. raw velocities) of all the players.
     
-    params['max_int_time'] = 10
-    ## upper limit on integral time
+    Argument:
+    values -- array of shape (n_frames, n_columns), differences from the previous frame.
+    period -- array of shape (n_frames,), period of each frame.
+    window -- int, smoothing window size in number of frames.
+    filter_type -- str, 'moving_average', 'nan_moving_average' or 'savgol'.
+    polyorder -- int, order of the polynomial for the 'savgol' filter.
     
-    params['model_converge_tol'] = 0.01
-    ## assume convergence when PPCF>0.99 at a given location.
-    ## The following are 'short-cut' parameters. We do not need to calculated PPCF 
-    ## explicitly when a player has a sufficient head start. 
-    ## A sufficient head start is when the a player arrives at the target location 
-    ## at least 'time_to_control' seconds before the next player
+    Returns:
+    smooth -- array of shape (n_frames, n_columns), smoothed values.
+    '''
+    if filter_type == 'moving_average':
+        return moving_average(values, window)
     
-    params['time_to_control_att'] = time_to_control * np.log(10) * (np.sqrt(3) * params['sigma'] / np.pi + 1/params['lambda_att'])
-    params['time_to_control_def'] = time_to_control * np.log(10) * (np.sqrt(3) * params['sigma'] / np.pi + 1/params['lambda_def'])
+    ## first frame of each period has the difference from the previous period
+    period_start = np.r_[True, period[1:] != period[:-1]]
+    values[period_start] = np.nan
     
-    return params
-   
-def initialize_players(team, team_name, params):
+    if filter_type == 'nan_moving_average':
+        return nan_moving_average(values, window, period)
+    elif filter_type == 'savgol':
+        return savgol_smooth(values, window, polyorder, period)
+    else:
+        assert False, "filter_type must be moving_average, nan_moving_average or savgol"
+
+def raw_velocity(df, player_ids, max_speed=12):
     '''
-    Function to create a list of players that hold their position and velocities from tracking dataframe.
+    Function to compute velocities from the difference in position of
+    each player between frames, before any smoothing.
     
-    Arguments:
-    team -- tracking_data for either home team or away team.
-    team_name -- either 'Home' or 'Away'.
-    params -- dict, dictionary of default parameters for our pitch control model.
+    Argument:
+    df -- dataframe object, tracking dataframe.
+    player_ids -- list, player ids like 'Home_11'.
+    max_speed -- int, maximum speed a player can achieve(in meters/second), 
+                 faster values are set to NaN.
     
     Returns:
-    team_players -- list having player positions and velocities.
+    velocity -- array of shape (n_frames, 2 * n_players), raw vx of all the players
+                and then vy, in Fortran order.
+    dt -- array of shape (n_frames,), difference in time from the previous frame.
     '''
-    ## getting player ids
-    player_ids = np.unique([c[:-2] for c in team.columns if c.split('_')[0] in ['Home', 'Away']])
+    n_players = len(player_ids)
     
-    ## create empty list
-    team_players = []
+    ## computing the difference in time for each frame
+    dt = df['Time [s]'].diff().values
     
-    for pid in player_ids:
-        team_player = Player(pid, team, team_name, params)
-        if team_player.inframe:
-            team_players.append(team_player)
+    ## (n_frames, 2 * n_players) array for x and then y positions
+    columns = [player + '_X' for player in player_ids] + [player + '_Y' for player in player_ids]
+    positions = np.asfortranarray(df[columns].to_numpy(dtype=np.float64))
     
-    return team_players
+    velocity = np.empty_like(positions)
+    velocity[0] = np.nan
     
+    ## one player at a time, so the columns stay in the cache
+    for player in range(n_players):
+        vx, vy = velocity[1:, player], velocity[1:, n_players + player]
+        
+        ## calculating velocities
+        np.subtract(positions[1:, player], positions[:-1, player], out=vx)
+        np.subtract(positions[1:, n_players + player], positions[:-1, n_players + player], out=vy)
+        vx /= dt[1:]
+        vy /= dt[1:]
+        
+        ## removing outliers
+        outliers = (vx * vx + vy * vy) > max_speed**2
+        vx[outliers] = np.nan
+        vy[outliers] = np.nan
+    
+    return velocity, dt
 
-def generate_pitch_control_for_events(event_id, event_data, tracking_home, tracking_away, params):
+def cal_velocity(df, max_speed=12, window=7, vectorised=True, filter_type='moving_average', polyorder=1):
     '''
-    Function for generating the pitch control surface for any given event.
+    Fucntion to calculate velocity for the tracking dataframe.
     
-    Arguments:
-    event_id -- int, index of the event in event's dataframe.
-    event_data -- event dataframe.
-    tracking_home -- tracking data for home team.
-    tracking_away -- tracking data for away team.
-    params -- dict, default parameters for our model.
+    Argument:
+    df -- dataframe object, tracking dataframe.
+    max_speed -- int, maximum speed a player can achieve(in meters/second).
+    window -- int, smoothing window size in number of frames.
+    vectorised -- bool, True for computing all the players at once,
+                  False for computing one player at a time.
+    filter_type -- str, 'moving_average' for the plain moving average,
+                   'nan_moving_average' or 'savgol' for the NaN aware filters
+                   which also restart at every period.
+    polyorder -- int, order of the polynomial for the 'savgol' filter.
     
     Returns:
-    ----
-    '''
-    field_dims = (105, 68)
-    ## field dimension for our pitch map
-    
-    n_grid_cell_x = 50
-    ## number of pixels in the grid(in x-direction) 
-    ## n_grid_cell_y will be calculated based on n_grid_cell_x and field dimensions
-    
-    ## getting the starting frame, team in possession, ball's starting position
-    pass_frame = event_data.loc[event_id, 'Start Frame']
-    pass_team = event_data.loc[event_id, 'Team']
-    ball_start_pos = np.array([event_data.loc[event_id, 'Start X'], event_data.loc[event_id, 'Start Y']])
-    
-    ## breaking the pitch down into grids
-    n_grid_cell_y = int(n_grid_cell_x * field_dims[1]) / field_dims[0]
-    x_grid = np.linspace(-field_dims[0] / 2, field_dims[0] / 2, n_grid_cell_x)
-    y_grid = np.linspace(-field_dims[1] / 2, field_dims[1] / 2, n_grid_cell_y)
-    
-    ## initializing pitch control grids for attacking and defending teams
-    PPCF_a = np.zeros(shape=(len(y_grid), len(x_grid)))
-    PPCF_d = np.zeros(shape=(len(y_grid), len(x_grid)))
-    
-    ## initializing player positions and velocities for pitch control calculations
-    if pass_team == 'Home':
-        attacking_players = initialize_players(tracking_home.loc[pass_frame], 'Home', params)
-        defending_players = initialize_players(tracking_away.loc[pass_frame], 'Away', params)
-    elif pass_team == 'Away':
-        attacking_players = initialize_players(tracking_away.loc[pass_frame], 'Away', params)
-        defending_players = initialize_players(tracking_home.loc[pass_frame], 'Home', params)
-    else:
-        assert False, "Team in possession must be either home or away"
+    df -- dataframe object, a new tracking dataframe with the velocity columns,
+          the dataframe passed in is not changed.
+    '''
+    df = remove_velocity(df)
+    ## removing velocity columns if present
+    
+    ## getting the player ids
+    player_ids = np.unique([cols[:-2] for cols in df.columns if cols.split('_')[0] in ['Home', 'Away']])
+        
+    ## computing the difference in time for each frame
+    dt = df['Time [s]'].diff()
+    
+    assert vectorised or filter_type == 'moving_average', "Only moving_average can be used one player at a time"
+    
+    if vectorised:
+        n_players = len(player_ids)
+        velocity, _ = raw_velocity(df, player_ids, max_speed)
+        
+        ## smooting x and y together
+        smooth = smooth_values(velocity, df['Period'].values, window, filter_type, polyorder)
+        
+        ## columns are kept per channel(all vx, all vy, all speed), so nothing is interleaved
+        values = np.empty((len(df), 3 * n_players), order='F')
+        values[:, :2 * n_players] = smooth
+        for player in range(n_players):
+            vx, vy = smooth[:, player], smooth[:, n_players + player]
+            np.sqrt(vx * vx + vy * vy, out=values[:, 2 * n_players + player])
+        
+        ## attaching all the new columns in one go
+        columns = [player + suffix for suffix in ['_vx', '_vy', '_speed'] for player in player_ids]
+        velocity = pd.DataFrame(values, index=df.index, columns=columns, copy=False)
+        
+        return pd.concat([df, velocity], axis=1)
+    
+    for player in player_ids:
+        ## calculating velocities
+        vx = df[player + '_X'].diff() / dt
+        vy = df[player + '_Y'].diff() / dt
+        
+        ## removing outliers
+        raw_speed = np.sqrt(vx**2 + vy**2)
+        vx[raw_speed > max_speed] = np.nan
+        vy[raw_speed > max_speed] = np.nan
+        
+        ## smooting the values
+        ma_window = np.ones(window) / window
+        vx = np.convolve(vx, v=ma_window, mode='same')
+        vy = np.convolve(vy, v=ma_window, mode='same')
+        
+        df[player + '_vx'] = vx
+        df[player + '_vy'] = vy
+        df[player + '_speed'] = np.sqrt(vx**2 + vy**2)
+    
+    return df
+
+def cal_kinematics(df, max_speed=12, window=7, filter_type='moving_average', polyorder=1):
+    '''
+    Function to calculate velocity, speed, acceleration, jerk and distance
+    covered for all the players in one pass over the positions.
+    Positions are differenced once, speed is differenced for acceleration
+    and acceleration for jerk, each being smoothed with the same filter.
+    
+    The defaults are the same as cal_velocity, so '_vx', '_vy' and '_speed'
+    match it. 'savgol' gives smoother acceleration and jerk and does not
+    spread NaN values over the window.
+    
+    Argument:
+    df -- dataframe object, tracking dataframe.
+    max_speed -- int, maximum speed a player can achieve(in meters/second).
+    window -- int, smoothing window size in number of frames.
+    filter_type -- str, 'moving_average', 'nan_moving_average' or 'savgol'.
+    polyorder -- int, order of the polynomial for the 'savgol' filter.
+    
+    Returns:
+    kinematics -- dataframe object, float32 values indexed by frame, with
+                  '_vx', '_vy', '_speed'(m/s), '_acc'(m/s^2), '_jerk'(m/s^3)
+                  and '_distance'(cumulative meters) columns for each player.
+    '''
+    ## getting the player ids
+    player_ids = [cols[:-2] for cols in df.columns 
+                  if cols.split('_')[0] in ['Home', 'Away'] and cols[-2:] == '_X']
+    n_players = len(player_ids)
+    period = df['Period'].values
+    
+    velocity, dt = raw_velocity(df, player_ids, max_speed)
+    
+    ## smooting x and y together
+    smooth = smooth_values(velocity, period, window, filter_type, polyorder)
+    vx, vy = smooth[:, :n_players], smooth[:, n_players:]
+    speed = np.sqrt(vx**2 + vy**2)
+    
+    ## acceleration from the change in speed, jerk from the change in acceleration
+    channels = [speed]
+    for _ in range(2):
+        change = np.full(speed.shape, np.nan)
+        change[1:] = np.diff(channels[-1], axis=0) / dt[1:, np.newaxis]
+        channels.append(smooth_values(change, period, window, filter_type, polyorder))
+    
+    ## distance covered, frames without speed add nothing
+    step = np.where(np.isnan(speed), 0.0, speed) * np.nan_to_num(dt)[:, np.newaxis]
+    distance = np.cumsum(step, axis=0)
+    
+    columns = [player + suffix for player in player_ids 
+               for suffix in ['_vx', '_vy', '_speed', '_acc', '_jerk', '_distance']]
+    values = np.stack([vx, vy, speed, channels[1], channels[2], distance], axis=2).astype(np.float32)
+    
+    return pd.DataFrame(values.reshape(len(df), -1), index=df.index, columns=columns, copy=False)
+
+def kinematics_summary(kinematics, acc_threshold=2.0, min_frames=13):
+    '''
+    Function to summarise the kinematics of each player: distance covered,
+    top speed and the number of accelerations and decelerations, an effort
+    being at least min_frames frames in a row above acc_threshold(or below -acc_threshold).
+    
+    Argument:
+    kinematics -- dataframe object, returned by cal_kinematics.
+    acc_threshold -- float, acceleration(in m/s^2) for an effort.
+    min_frames -- int, minimum length of an effort in frames(13 frames is about 0.5 seconds at 25 fps).
+    
+    Returns:
+    summary -- dataframe object, one row for each player.
+    '''
+    player_ids = [cols[:-len('_acc')] for cols in kinematics.columns if cols.endswith('_acc')]
+    acc = kinematics[[player + '_acc' for player in player_ids]].values
+    
+    summary = pd.DataFrame(index=pd.Index(player_ids, name='player_id'))
+    summary['distance'] = kinematics[[player + '_distance' for player in player_ids]].values[-1]
+    summary['max_speed'] = kinematics[[player + '_speed' for player in player_ids]].max().values
+    summary['n_accelerations'] = count_efforts(acc > acc_threshold, min_frames)
+    summary['n_decelerations'] = count_efforts(acc < -acc_threshold, min_frames)
+    
+    return summary
+
+def count_efforts(mask, min_frames):
+    '''
+    Function to count runs of True values, at least min_frames long, in every column.
+    
+    Argument:
+    mask -- bool array of shape (n_frames, n_columns).
+    min_frames -- int, minimum length of a run.
+    
+    Returns:
+    counts -- int array of shape (n_columns,).
+    '''
+    n_frames, n_columns = mask.shape
+    
+    ## columns one after the other with a False between them, so runs do not join
+    flat = np.zeros((n_columns, n_frames + 2), dtype=np.int8)
+    flat[:, 1:-1] = mask.T
+    change = np.diff(flat.ravel())
+    starts, ends = np.flatnonzero(change == 1), np.flatnonzero(change == -1)
+    
+    long_runs = (ends - starts) >= min_frames
+    
+    return np.bincount(starts[long_runs] // (n_frames + 2), minlength=n_columns)
+
+class VelocityEstimator:
+    '''
+    class that computes smoothed player velocities frame by frame for a
+    live feed, keeping the last window raw velocities of each player in a
+    ring buffer.
+    
+    The smoothing window is centred, so the velocity of a frame is given
+    (window - 1) // 2 frames after it is received. The values are the same
+    as cal_velocity with the same parameters gives for the whole match.
+    '''
+    
+    def __init__(self, player_ids, max_speed=12, window=7, filter_type='moving_average', polyorder=1):
+        '''
+        Function to initialize VelocityEstimator class objects.
+        
+        Arguments:
+        self -- represents the object of the class.
+        player_ids -- list, player ids like 'Home_11', in the order positions will be given.
+        max_speed -- int, maximum speed a player can achieve(in meters/second).
+        window -- int, smoothing window size in number of frames.
+        filter_type -- str, 'moving_average', 'nan_moving_average' or 'savgol'.
+        polyorder -- int, order of the polynomial for the 'savgol' filter.
+        '''
+        self.player_ids = list(player_ids)
+        self.max_speed = max_speed
+        self.window = window
+        self.filter_type = filter_type
+        self.polyorder = polyorder
+        self.back = (window - 1) // 2
+        
+        ## ring buffers for raw velocities(x and y of all the players side by side),
+        ## period and frame number, empty slots are like the padding in cal_velocity
+        n_players = len(self.player_ids)
+        pad_value = 0.0 if filter_type == 'moving_average' else np.nan
+        self.velocity = np.full((window, 2 * n_players), pad_value)
+        self.period = np.zeros(window)
+        self.frames = np.full(window, -1)
+        self.pos = 0
+        self.pad_value = pad_value
+        
+        ## last frame received
+        self.last_position = None
+        self.last_time = None
+        self.last_period = None
+    
+    def push(self, frame, velocity, period):
+        '''
+        Function to add a raw velocity to the ring buffers and compute the
+        smoothed velocity of the frame in the centre of the window.
+        
+        Arguments:
+        self -- represents the object of the class.
+        frame -- int, frame number, -1 for padding.
+        velocity -- array of shape (2 * n_players,), raw vx of all the players and then vy.
+        period -- int, period of the frame.
+        
+        Returns:
+        frame -- int, frame number of the smoothed velocity, -1 if there is none yet.
+        velocity -- array of shape (n_players, 2), smoothed (vx, vy) of each player.
+        '''
+        self.velocity[self.pos] = velocity
+        self.period[self.pos] = period
+        self.frames[self.pos] = frame
+        self.pos = (self.pos + 1) % self.window
+        
+        ## oldest to newest
+        order = (self.pos + np.arange(self.window)) % self.window
+        centre = self.window // 2
+        values, periods = self.velocity[order], self.period[order]
+        
+        if self.filter_type == 'moving_average':
+            smooth = values.sum(axis=0) / self.window
+        elif self.filter_type == 'nan_moving_average':
+            smooth = nan_moving_average(values, self.window, periods)[centre]
+        elif self.filter_type == 'savgol':
+            smooth = savgol_smooth(values, self.window, self.polyorder, periods)[centre]
+        else:
+            assert False, "filter_type must be moving_average, nan_moving_average or savgol"
+        
+        return self.frames[order][centre], smooth.reshape(2, -1).T
+    
+    def update(self, frame, time, period, positions):
+        '''
+        Function to add a new frame of the live feed.
+        
+        Arguments:
+        self -- represents the object of the class.
+        frame -- int, frame number.
+        time -- float, time of the frame in seconds.
+        period -- int, period of the frame.
+        positions -- array of shape (n_players, 2), (x, y) of each player.
+        
+        Returns:
+        frame -- int, frame number of the smoothed velocity, -1 if there is none yet.
+        velocity -- array of shape (n_players, 2), smoothed (vx, vy) of each player.
+        '''
+        positions = np.asarray(positions, dtype=np.float64)
+        
+        ## raw velocity from the previous frame
+        if self.last_position is None:
+            velocity = np.full(positions.shape, np.nan)
+        else:
+            velocity = (positions - self.last_position) / (time - self.last_time)
+            velocity[(velocity**2).sum(axis=1) > self.max_speed**2] = np.nan
+            
+            ## the NaN aware filters restart at every period
+            if self.filter_type != 'moving_average' and period != self.last_period:
+                velocity[:] = np.nan
+        
+        self.last_position, self.last_time, self.last_period = positions, time, period
+        
+        return self.push(frame, velocity.T.ravel(), period)
+    
+    def flush(self):
+        '''
+        Function to get the smoothed velocities of the last frames
+        once the feed has ended.
+        
+        Arguments:
+        self -- represents the object of the class.
+        
+        Returns:
+        outputs -- list of (frame, velocity) tuples.
+        '''
+        outputs = []
+        for _ in range(self.back):
+            outputs.append(self.push(-1, self.pad_value, self.last_period))
+        
+        return outputs
@@ -4,14 +4,16 @@ Created on Sat Apr 18 20:09:17 2020
 @author: slothfulwave612
 This Python module will contain function for visualization.
 
-Module Used(2):
+Module Used(3):
 ---------------
 1. matplotlib -- plotting library in Python.
 2. numpy -- numerical computing library.
+3. utility_function_pitch_control -- Python module for pitch control functions.
 """
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
+import utility_function_pitch_control as ufpc
 
 def plot_pitch():
     '''
@@ -256,4 +258,108 @@ def save_match_clip(home_team, away_team, fname, fpath, fps=25, colors=('r', 'b'
     print('done')
     plt.clf()
     plt.close(fig)
+    
+def save_pitch_control_clip(home_team, away_team, attacking_team, params, fname, fpath, fps=25,
+                            n_grid_cell_x=32, every=5, batch_size=50, colors=('r', 'b'), dpi=50):
+    '''
+    Function to create and save a match clip with the pitch control
+    surface of the attacking team underneath the players.
+    
+    Surfaces are computed in batches of frames for every 'every'-th frame
+    and linearly interpolated for the frames in between. All the artists are
+    made once and only their data is updated for each frame.
+    
+    Every frame is still drawn in full by the movie writer, so the time taken
+    mostly depends on dpi. On one core a frame takes about 35 ms to draw at
+    dpi=50 and about 60 ms at dpi=100, i.e. a 30 second clip at 25 fps takes
+    about 30 seconds at dpi=50(surfaces included) and about 50 seconds at dpi=100.
+    
+    Arguments:
+    home_team -- dataframe object, tracking data with velocities for home team.
+    away_team -- dataframe object, tracking data with velocities for away team.
+    attacking_team -- str, 'Home' or 'Away', the team in possession.
+    params -- dict, default parameters for pitch control model.
+    fname -- str, video name.
+    fpath -- str, path where the video will be saved.
+    fps -- int, frames per second.
+    n_grid_cell_x -- int, number of pixels in the grid(in x-direction).
+    every -- int, pitch control is computed for every 'every'-th frame, 1 for all the frames.
+    batch_size -- int, number of frames for which pitch control is computed at a time.
+    colors -- tuple, having color values for home and away teams
+    dpi -- int, dots per inch of the video, lower is faster to draw.
+    '''
+    ## check if the indices are matched for both the dataframe
+    assert np.all(home_team.index == away_team.index), "Home and away team index must be the same."
+    
+    ## field dimensions
+    field_dims = (105, 68)
+    
+    index = home_team.index.values
+    
+    ## pitch control for every 'every'-th frame and the last frame
+    key_pos = np.unique(np.append(np.arange(0, len(index), every), len(index) - 1))
+    surfaces, _, _ = ufpc.pitch_control_for_frames(home_team, away_team, attacking_team, params, index[key_pos],
+                                                   n_grid_cell_x=n_grid_cell_x, batch_size=batch_size)
+    
+    ## positions and velocities of the players, ball position and time
+    team_data = []
+    for team, team_name in zip([home_team, away_team], ['Home', 'Away']):
+        _, positions, velocities = ufpc.team_arrays(team, team_name)
+        team_data.append((positions, velocities))
+    ball = home_team[['ball_X', 'ball_Y']].values
+    match_time = home_team['Time [s]'].values
+    
+    ## figure and movie settings
+    fig, ax = plot_pitch()
+    ffmpeg = animation.writers['ffmpeg']
+    writer = ffmpeg(fps=fps)
+    fname = fpath + '/' + fname + '.mp4'
+    
+    ## making all the artists once, with the first frame
+    cmap = 'bwr' if attacking_team == 'Home' else 'bwr_r'
+    surface_obj = ax.imshow(surfaces[0], extent=(-field_dims[0] / 2, field_dims[0] / 2, -field_dims[1] / 2, field_dims[1] / 2),
+                            origin='lower', interpolation='bilinear', vmin=0.0, vmax=1.0, cmap=cmap, alpha=0.5, zorder=0)
+    
+    player_objs, quiver_objs = [], []
+    for (positions, velocities), color in zip(team_data, colors):
+        objs, = ax.plot(positions[0, :, 0], positions[0, :, 1], color + 'o', markersize=10, alpha=0.7)
+        player_objs.append(objs)
+        
+        objs = ax.quiver(positions[0, :, 0], positions[0, :, 1], velocities[0, :, 0], velocities[0, :, 1], color=color,
+                         scale_units='inches', scale=10., width=0.0015, headlength=5, headwidth=3, alpha=0.7)
+        quiver_objs.append(objs)
+    
+    ball_obj, = ax.plot(ball[0, 0], ball[0, 1], 'ko', markersize=7, alpha=0.5)
+    time_obj = plt.text(-2.5, field_dims[1] / 2, '', fontsize=15)
+    
+    print('Generating Moive...', end='')
+    
+    ## create the clip and save it
+    with writer.saving(fig, fname, dpi=dpi):
+        for i in range(len(index)):
+            ## interpolating between the two computed surfaces around this frame
+            k = np.searchsorted(key_pos, i, side='right') - 1
+            if key_pos[k] == i:
+                surface = surfaces[k]
+            else:
+                w = (i - key_pos[k]) / (key_pos[k + 1] - key_pos[k])
+                surface = (1 - w) * surfaces[k] + w * surfaces[k + 1]
+            surface_obj.set_data(surface)
+            
+            ## moving the players, velocity vectors and the ball
+            for (positions, velocities), player_obj, quiver_obj in zip(team_data, player_objs, quiver_objs):
+                player_obj.set_data(positions[i, :, 0], positions[i, :, 1])
+                quiver_obj.set_offsets(positions[i])
+                quiver_obj.set_UVC(velocities[i, :, 0], velocities[i, :, 1])
+            ball_obj.set_data([ball[i, 0]], [ball[i, 1]])
+            
+            ## include match time
+            frame_minus = int(match_time[i] / 60)
+            frame_secs = (match_time[i] / 60 - frame_minus) * 60
+            time_obj.set_text('%d: %1.2f' % (frame_minus, frame_secs))
             
+            writer.grab_frame()
+    
+    print('done')
+    plt.clf()
+    plt.close(fig)